@@ -0,0 +1,43 @@
+/* assets/metronome.js */
+
+/*
+ * Tap-tempo metronome, run in the browser so taps cost no server round trip.
+ * Taps are timed with performance.now(), only the last TAP_WINDOW taps are kept,
+ * intervals far from the median are ignored, and a long pause starts over.
+ */
+const TAP_WINDOW = 8;  // Most recent taps used to measure the tempo
+const TAP_RESET_MS = 2000;  // A pause this long starts a new measurement
+const TAP_OUTLIER_TOLERANCE = 0.3;  // Intervals more than 30% off the median are dropped
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    metronome: {
+        tap_tempo: function(n_clicks, tap_times) {
+            if (!n_clicks) {
+                return ["Tap to set tempo", []];
+            }
+
+            const now = performance.now();
+            let taps = (tap_times || []).slice(-(TAP_WINDOW - 1));
+            if (taps.length && now - taps[taps.length - 1] > TAP_RESET_MS) {
+                taps = [];
+            }
+            taps.push(now);
+
+            if (taps.length < 2) {
+                return ["Keep tapping", taps];
+            }
+
+            // Intervals between successive taps, without stray double-taps or missed beats
+            const intervals = taps.slice(1).map((time, i) => time - taps[i]);
+            const sorted = intervals.slice().sort((a, b) => a - b);
+            const median = sorted[Math.floor(sorted.length / 2)];
+            const steady = intervals.filter(
+                (interval) => Math.abs(interval - median) <= median * TAP_OUTLIER_TOLERANCE
+            );
+            const averageInterval = steady.reduce((sum, interval) => sum + interval, 0) / steady.length;
+
+            const tempo = 60000 / averageInterval;  // Convert interval (ms) to beats per minute (BPM)
+            return [`Tempo: ${Math.round(tempo)} BPM`, taps];
+        }
+    }
+});
@@ -0,0 +1,6 @@
+"""
+benchmarks/
+
+Benchmarks for the NoteNotes app. Run each module from the project root with `python -m`,
+e.g. `python -m benchmarks.callback_fanout`. Results are printed as JSON.
+"""
@@ -0,0 +1,277 @@
+"""
+benchmarks/callback_fanout.py
+
+Counts the callback requests each step of a user session costs, against the running app.
+Every server-side callback a change triggers is a separate request to `/_dash-update-component`,
+and a callback's outputs can trigger more callbacks in turn (a library change re-renders the
+library page and the search results), so the requests are counted as the server receives them
+rather than read off the callback map.
+
+The browser is played by a small emulation of the Dash renderer: it keeps the page's component
+tree from `/_dash-layout`, sends a request for each server callback whose inputs changed, applies
+the responses (Patch updates included) and follows the chain until nothing is left to fire.
+Callbacks fire in waves, every callback triggered by one wave's outputs making the next, and
+components that responses add to the page get the initial calls of the callbacks they're an input
+or output of. Clientside callbacks run in the
+browser, so they cost no request and their outputs aren't followed.
+
+The session opens the search page, searches, adds a result, opens it, edits and submits one of
+its links, then goes to the library page and opens a row there.
+
+Usage:
+    python -m benchmarks.callback_fanout [--output before.json]
+"""
+
+import argparse
+import copy
+import json
+import os
+import tempfile
+import uuid
+import flask
+
+SEARCH_QUERY = 'love'
+RESOURCE_LINK = 'https://example.com/lyrics'
+MAX_WAVES = 20  # A longer chain means a callback loop
+
+# (step, action, component type or path, {property: value} set first without triggering anything)
+SESSION = [
+    ('open the search page', 'load', '/search', {}),
+    ('search', 'click', 'search-button', {'search-input': {'value': SEARCH_QUERY}}),
+    ('add a song', 'click', 'song-check', {}),
+    ('open a search result', 'click', 'search-row', {}),
+    ('edit a resource', 'click', 'edit-resource', {}),
+    ('submit a resource link', 'click', 'submit-link', {'input-link': {'value': RESOURCE_LINK}}),
+    ('go to the library', 'navigate', '/library', {}),
+    ('open a library row', 'click', 'library-row', {}),
+]
+
+
+# The {'id', 'property'} of each of a dependency's outputs
+def _output_specs(dependency):
+    outputs = dependency['output']
+    specs = outputs[2:-2].split('...') if outputs.startswith('..') else [outputs]
+    return [{'id': spec.rsplit('.', 1)[0], 'property': spec.rsplit('.', 1)[1].split('@')[0]} for spec in specs]
+
+
+# Dash's string form of a component id: dict ids as JSON with sorted keys
+def _id_key(component_id):
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+    return component_id
+
+
+def _parse_id(spec_id):
+    return json.loads(spec_id) if spec_id.startswith('{') else spec_id
+
+
+# A dependency's id matches a component's when they're equal, or when it's a pattern with
+# the same keys whose values are equal or wildcards (["ALL"] and the like)
+def _matches(pattern, component_id):
+    if not isinstance(pattern, dict):
+        return pattern == component_id
+    if not isinstance(component_id, dict) or pattern.keys() != component_id.keys():
+        return False
+    return all(isinstance(value, list) or component_id[key] == value for key, value in pattern.items())
+
+
+def _apply_patch(value, operations):
+    for operation in operations:
+        name, location, params = operation['operation'], operation['location'], operation.get('params', {})
+        parent = value
+        for step in location[:-1]:
+            parent = parent[step]
+        if not location:
+            target = value
+        else:
+            target = parent[location[-1]]
+        if name == 'Assign':
+            if not location:
+                value = params['value']
+            else:
+                parent[location[-1]] = params['value']
+        elif name == 'Delete':
+            del parent[location[-1]]
+        elif name == 'Append':
+            target.append(params['value'])
+        elif name == 'Prepend':
+            target.insert(0, params['value'])
+        elif name == 'Insert':
+            target.insert(params['index'], params['value'])
+        elif name == 'Extend':
+            target.extend(params['value'])
+        elif name == 'Merge':
+            target.update(params['value'])
+        elif name == 'Clear':
+            target.clear()
+        elif name == 'Remove':
+            target.remove(params['value'])
+        else:
+            raise ValueError(f"Unsupported patch operation: {name}")
+    return value
+
+
+class RendererEmulator:
+    def __init__(self, app):
+        self.client = app.server.test_client()
+        self.requests = 0
+        self.callbacks = []
+        flask.request_started.connect(self._count_request, app.server)
+
+        self.client.get('/')
+        self.dependencies = [dependency for dependency in self.client.get('/_dash-dependencies').get_json()
+                             if not dependency.get('clientside_function')]
+        self.tree = self.client.get('/_dash-layout').get_json()
+        self.components = {}
+        self._index()
+
+    def _count_request(self, sender, **extra):
+        if flask.request.path.endswith('/_dash-update-component'):
+            self.requests += 1
+            self.callbacks.append(flask.request.get_json()['output'])
+
+    # Every component in the tree with an id, as {id key: (id, props)}, in page order
+    def _index(self):
+        components = {}
+        pending = [self.tree]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, list):
+                pending.extend(reversed(node))
+            elif isinstance(node, dict) and 'props' in node:
+                props = node['props']
+                if 'id' in props:
+                    components[_id_key(props['id'])] = (props['id'], props)
+                for value in props.values():
+                    if isinstance(value, (list, dict)):
+                        pending.append(value)
+        self.components = components
+
+    def find(self, component_type):
+        for component_id, props in self.components.values():
+            if component_id == component_type or (isinstance(component_id, dict)
+                                                  and component_id.get('type') == component_type):
+                return component_id, props
+        return None, None
+
+    def _resolve(self, spec, with_value):
+        pattern = _parse_id(spec['id'])
+        found = [{'id': component_id, 'property': spec['property'],
+                  **({'value': props.get(spec['property'])} if with_value else {})}
+                 for component_id, props in self.components.values() if _matches(pattern, component_id)]
+        if isinstance(pattern, dict):
+            return found
+        return found[0] if found else None
+
+    def _triggered_by(self, changed, dependency):
+        return [key for key in changed
+                if any(spec['property'] == key[1] and _matches(_parse_id(spec['id']), self.components[key[0]][0])
+                       for spec in dependency['inputs'] if key[0] in self.components)]
+
+    def _dispatch(self, dependency, triggered):
+        inputs = [self._resolve(spec, True) for spec in dependency['inputs']]
+        if any(value is None for value in inputs):
+            return {}  # The renderer doesn't fire a callback when an input isn't on the page
+        outputs = dependency['output']
+        resolved_outputs = [self._resolve(spec, False) for spec in _output_specs(dependency)]
+        if any(value is None for value in resolved_outputs):
+            return {}  # Nor when an output isn't
+        body = {
+            'output': outputs,
+            'outputs': resolved_outputs if outputs.startswith('..') else resolved_outputs[0],
+            'inputs': inputs,
+            'state': [self._resolve(spec, True) for spec in dependency['state']],
+            'changedPropIds': [f'{key}.{prop}' for key, prop in triggered],
+        }
+        response = self.client.post('/_dash-update-component', json=body)
+        if response.status_code == 204:
+            return {}
+        if response.status_code != 200:
+            raise RuntimeError(f"{outputs} failed with {response.status_code}: {response.data[:500]}")
+        return response.get_json()['response']
+
+    # Applies one wave's responses, returning the props they changed and the ids they added
+    def _apply(self, responses):
+        changed = set()
+        before = set(self.components)
+        for response in responses:
+            for key, props in response.items():
+                if key not in self.components:
+                    continue
+                target = self.components[key][1]
+                for prop, value in props.items():
+                    if isinstance(value, dict) and '__dash_patch_update' in value:
+                        value = _apply_patch(copy.deepcopy(target.get(prop)), value['operations'])
+                    target[prop] = value
+                    changed.add((key, prop))
+        self._index()
+        return changed, set(self.components) - before
+
+    # Fires the callbacks of a set of changes, and of the changes those make, until none are left
+    def run(self, changed=(), added=(), initial=False):
+        changed, added = set(changed), set(added)
+        for _ in range(MAX_WAVES):
+            wave = []
+            for dependency in self.dependencies:
+                triggered = self._triggered_by(changed, dependency)
+                is_new = any(_matches(_parse_id(spec['id']), self.components[key][0])
+                             for key in added for spec in dependency['inputs'] + _output_specs(dependency))
+                if triggered or ((initial or is_new) and not dependency.get('prevent_initial_call')):
+                    wave.append((dependency, triggered))
+            if not wave:
+                return
+            initial = False
+            changed, added = self._apply([self._dispatch(dependency, triggered) for dependency, triggered in wave])
+        raise RuntimeError("Callbacks kept triggering each other")
+
+    def set_props(self, values):
+        for component_id, props in values.items():
+            self.components[_id_key(component_id)][1].update(props)
+
+    def click(self, component_type):
+        component_id, props = self.find(component_type)
+        if component_id is None:
+            return False
+        props['n_clicks'] = (props.get('n_clicks') or 0) + 1
+        self.run(changed={(_id_key(component_id), 'n_clicks')})
+        return True
+
+    def navigate(self, pathname):
+        self.set_props({'url': {'pathname': pathname}})
+        self.run(changed={('url', 'pathname')})
+
+
+def measure_fanout():
+    # The session's library goes in a throwaway database, set before the app is imported
+    os.environ.setdefault('NOTENOTES_LIBRARY_DB', os.path.join(tempfile.mkdtemp(), 'library.db'))
+    from main import app
+    browser = RendererEmulator(app)
+    # A new user key, so the session starts from an empty library
+    user_id = f'fanout-benchmark-{uuid.uuid4().hex}'
+    browser.set_props({'library-session': {'data': {'user_id': user_id}, 'modified_timestamp': 1}})
+    results = {}
+    for step, action, target, props in SESSION:
+        browser.set_props(props)
+        start, browser.callbacks = browser.requests, []
+        if action == 'load':
+            browser.set_props({'url': {'pathname': target}})
+            browser.run(initial=True)
+        elif action == 'navigate':
+            browser.navigate(target)
+        elif not browser.click(target):
+            results[step] = {'requests': None, 'note': f"no {target} on the page"}
+            continue
+        results[step] = {'requests': browser.requests - start, 'callbacks': browser.callbacks}
+    results['total'] = sum(result['requests'] or 0 for result in results.values())
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help="Also write the report to this JSON file")
+    args = parser.parse_args()
+    report = json.dumps(measure_fanout(), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(report)
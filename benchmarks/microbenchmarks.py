@@ -0,0 +1,212 @@
+"""
+benchmarks/microbenchmarks.py
+
+Times the hot paths of the app against synthetic catalogs (benchmarks/synthetic_catalog.py),
+reporting wall time and the serialized size of what each one sends to the browser.
+Callbacks are driven through Dash's HTTP endpoint, so their timings include request
+handling and JSON serialization, and their payload is the response body.
+
+Each catalog size runs in its own process, since the catalog is loaded once per process.
+The app is pointed at the synthetic catalog and a throwaway library database through the
+NOTENOTES_CATALOG and NOTENOTES_LIBRARY_DB environment variables.
+
+Functions:
+    - run_benchmarks(repeats): Runs every benchmark against the catalog this process loaded.
+    - benchmark_sizes(sizes, repeats): Runs the benchmarks once per catalog size, each in a subprocess.
+
+Usage:
+    python -m benchmarks.microbenchmarks [--sizes 10000 100000 1000000] [--repeats 20] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import plotly
+from benchmarks.synthetic_catalog import CATALOG_DIR, CATALOG_SIZES, write_catalog
+
+SEARCH_QUERIES = ['love', 'the', 'you', 'arianna grnde']  # Common words, plus a typo for the fuzzy fallback
+PAGE_SIZE = 25  # Rows per rendered page, as on the search page
+LIBRARY_SIZE = 200  # Tracks in the library that load_library renders
+BENCHMARK_USER = 'benchmark-user'
+BULK_QUERY = 'love'  # Search whose results the bulk add benchmark adds
+
+
+def _timed(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    summary = {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+    }
+    return summary, result
+
+
+# Bytes the value takes once Dash serializes it for the browser
+def _payload_bytes(value):
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+# POSTs a callback request the way the Dash renderer does, and returns the response body
+def _dispatch(client, output, inputs, state=(), triggered=()):
+    def parse(spec):
+        component_id, prop = spec.rsplit('.', 1)
+        if component_id.startswith('{'):
+            component_id = json.loads(component_id)
+        return {'id': component_id, 'property': prop.split('@')[0]}
+
+    outputs = [parse(spec) for spec in output[2:-2].split('...')] if output.startswith('..') else parse(output)
+    response = client.post('/_dash-update-component', json={
+        'output': output, 'outputs': outputs, 'inputs': list(inputs),
+        'state': list(state), 'changedPropIds': list(triggered)
+    })
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{output} failed with status {response.status_code}: {response.data[:500]!r}")
+    return response.data
+
+
+def _value(component_id, prop, value):
+    return {'id': component_id, 'property': prop, 'value': value}
+
+
+def _prop_id(component_id, prop):
+    return json.dumps(component_id, sort_keys=True, separators=(',', ':')) + '.' + prop
+
+
+def run_benchmarks(repeats):
+    results = {}
+
+    start = time.perf_counter()
+    from utils import catalog
+    results['load_catalog_and_index_s'] = round(time.perf_counter() - start, 3)
+    import main  # Sets the layout and registers the callbacks
+    from utils.helpers import (search_rank, song_row_generator, build_song_row, modal_attributes_generator,
+                               RESOURCE_TYPES)
+    from utils.library_store import library_store
+
+    df = catalog.sample_database
+    results['catalog_size'] = len(df)
+    tracks = catalog.get_tracks(df['track_id'][:max(PAGE_SIZE, LIBRARY_SIZE) + repeats].tolist())
+    page = tracks[:PAGE_SIZE]
+
+    for query in SEARCH_QUERIES:
+        timing, records = _timed(
+            lambda: search_rank(query, df, catalog.search_index, scored=True, limit=catalog.SEARCH_RESULT_CAP), repeats)
+        results[f'search_rank[{query}]'] = {**timing, 'matches': len(records), 'payload_bytes': _payload_bytes(records)}
+
+    # One page of search rows: rendered from scratch, then served from the row cache
+    timing, rows = _timed(lambda: [build_song_row(track['track_id'], track, 'search', False,
+                                                  (False,) * len(RESOURCE_TYPES))
+                                   for track in page], repeats)
+    results['song_row_generator[uncached page]'] = {**timing, 'payload_bytes': _payload_bytes(rows)}
+    timing, rows = _timed(lambda: [song_row_generator(track['track_id'], track, 'search', {})
+                                   for track in page], repeats)
+    results['song_row_generator[cached page]'] = {**timing, 'payload_bytes': _payload_bytes(rows)}
+
+    timing, attributes = _timed(lambda: modal_attributes_generator(page[0]), repeats)
+    results['modal_attributes_generator'] = {**timing, 'payload_bytes': _payload_bytes(attributes)}
+
+    client = main.app.server.test_client()
+    session = _value('library-session', 'data', {'user_id': BENCHMARK_USER})
+
+    # Clicking the add icon of a different search result each time
+    song_checks = [{'type': 'song-check', 'index': track['track_id'], 'action': 'add'} for track in page]
+    additions = iter(tracks[LIBRARY_SIZE:])
+
+    def add_song():
+        track = next(additions)
+        song_checks[0] = {'type': 'song-check', 'index': track['track_id'], 'action': 'add'}
+        inputs = [[_value(check, 'n_clicks', 1 if check is song_checks[0] else None) for check in song_checks]]
+        return _dispatch(client, 'user-library-store.data', inputs, [session],
+                         [_prop_id(song_checks[0], 'n_clicks')])
+
+    timing, body = _timed(add_song, repeats)
+    results['update_personal_library[add]'] = {**timing, 'payload_bytes': len(body)}
+
+    # Adding every result of a search in one bulk action, each time into an empty library
+    bulk_output = next(output for output, callback in main.app.callback_map.items()
+                       if any(callback_input['id'] == 'add-all-results' for callback_input in callback['inputs']))
+    search_page = {'query': BULK_QUERY, 'genres': [], 'tempo_range': None, 'page': 0}
+    bulk_users = iter(f'{BENCHMARK_USER}-bulk-{number}' for number in range(repeats))
+
+    def add_all_results():
+        bulk_session = _value('library-session', 'data', {'user_id': next(bulk_users)})
+        inputs = [_value(button, 'n_clicks', 1) for button in ('add-all-results', 'add-album', 'remove-selected')]
+        state = [_value('search-page', 'data', search_page), _value('modal-track', 'data', None), [], bulk_session]
+        return _dispatch(client, bulk_output, inputs, state, ['add-all-results.n_clicks'])
+
+    timing, body = _timed(add_all_results, repeats)
+    added = len(json.loads(body)['response']['user-library-store']['data']['changed'])
+    results[f'bulk_update_library[add all results, {added} tracks]'] = {**timing, 'payload_bytes': len(body)}
+    _, bulk_track_ids, _ = catalog.search_track_ids(BULK_QUERY)
+    for number in range(repeats):
+        library_store.remove_tracks(f'{BENCHMARK_USER}-bulk-{number}', bulk_track_ids)
+
+    library_store.remove_tracks(BENCHMARK_USER, [track['track_id'] for track in tracks])
+    library_store.add_tracks(BENCHMARK_USER, tracks[:LIBRARY_SIZE])
+    library_output = '..library-content.children...library-rendered.data..'
+
+    # Loading the app renders every library row
+    timing, body = _timed(lambda: _dispatch(
+        client, library_output, [_value('user-library-store', 'data', {}), session],
+        [_value('library-rendered', 'data', None)]), repeats)
+    results[f'load_library[full, {LIBRARY_SIZE} tracks]'] = {**timing, 'payload_bytes': len(body)}
+
+    # A change to one track only patches its row
+    first_id = tracks[0]['track_id']
+    revision, _ = library_store.get_library_with_revision(BENCHMARK_USER)
+    update = {'changed': [first_id], 'previous_revision': revision, 'revision': revision + 1,
+              'size': LIBRARY_SIZE, 'positions': {first_id: 0}}
+    timing, body = _timed(lambda: _dispatch(
+        client, library_output, [_value('user-library-store', 'data', update), session],
+        [_value('library-rendered', 'data', {'revision': revision, 'size': LIBRARY_SIZE})],
+        ['user-library-store.data']), repeats)
+    results[f'load_library[patch, {LIBRARY_SIZE} tracks]'] = {**timing, 'payload_bytes': len(body)}
+
+    library_store.remove_tracks(BENCHMARK_USER, [track['track_id'] for track in tracks])
+    return results
+
+
+def benchmark_sizes(sizes=CATALOG_SIZES, repeats=20):
+    runs = []
+    for size in sizes:
+        catalog_path = os.path.join(CATALOG_DIR, f'catalog_{size}.csv')
+        if not os.path.exists(catalog_path):
+            write_catalog(size)
+        with tempfile.TemporaryDirectory() as library_dir:
+            env = dict(os.environ, NOTENOTES_CATALOG=catalog_path,
+                       NOTENOTES_LIBRARY_DB=os.path.join(library_dir, 'library.db'))
+            worker = subprocess.run([sys.executable, '-m', 'benchmarks.microbenchmarks', '--worker',
+                                     '--repeats', str(repeats)],
+                                    env=env, check=True, capture_output=True, text=True)
+        runs.append(json.loads(worker.stdout))
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'repeats': repeats, 'runs': runs}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=CATALOG_SIZES)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help="Write the JSON results to this file as well as stdout")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:  # Benchmark the catalog this process was pointed at
+        print(json.dumps(run_benchmarks(args.repeats)))
+    else:
+        report = json.dumps(benchmark_sizes(args.sizes, args.repeats), indent=2)
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                output_file.write(report)
+        print(report)
@@ -0,0 +1,96 @@
+"""
+benchmarks/startup.py
+
+Profiles cold start: how long a fresh process takes to import main (after which the server
+can accept requests), how long loading the catalog and its index takes after that, and which
+imports the time goes to, from Python's `-X importtime` report. Each run is a new process,
+so nothing is served from an already-warm interpreter.
+
+Functions:
+    - profile_startup(): Profiles one cold start in a subprocess.
+    - startup_report(runs): Profiles several cold starts and summarizes them against the budget.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--top 15]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+STARTUP_BUDGET_S = 0.5  # Target for importing main, i.e. until a worker can serve requests
+
+# Run in the profiled process; prints its phase timings as JSON on stdout
+PROFILED_STARTUP = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.catalog.preload()
+print(json.dumps({'import_main_s': imported - start, 'load_catalog_s': time.perf_counter() - imported}))
+"""
+
+
+# `-X importtime` lines read "import time: <self us> | <cumulative us> | <indented module>"
+def _parse_importtime(report):
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        depth = (len(module) - len(module.lstrip()) - 1) // 2  # Top-level imports have one space
+        imports.append({'module': module.strip(), 'depth': depth,
+                        'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    return imports
+
+
+def profile_startup():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROFILED_STARTUP],
+                            check=True, capture_output=True, text=True)
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    profile['imports'] = _parse_importtime(result.stderr)
+    return profile
+
+
+def startup_report(runs=5, top=15):
+    profiles = [profile_startup() for _ in range(runs)]
+    import_main = statistics.median(profile['import_main_s'] for profile in profiles)
+
+    # Import cost per top-level package, summed over its modules' own time
+    packages = {}
+    for profile in profiles:
+        for entry in profile['imports']:
+            package = entry['module'].split('.')[0]
+            packages[package] = packages.get(package, 0) + entry['self_ms'] / runs
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    # What main itself imports, i.e. the app's own startup phases. The report lists a
+    # module's imports just before the module, so they're the lines above main's own
+    phases = []
+    last_imports = profiles[-1]['imports']
+    main_line = next(line for line, entry in enumerate(last_imports) if entry['module'] == 'main')
+    for entry in reversed(last_imports[:main_line]):
+        if entry['depth'] == 0:
+            break
+        if entry['depth'] == 1:
+            phases.insert(0, entry)
+
+    return {
+        'runs': runs,
+        'import_main_s': round(import_main, 3),
+        'load_catalog_s': round(statistics.median(profile['load_catalog_s'] for profile in profiles), 3),
+        'budget_s': STARTUP_BUDGET_S,
+        'within_budget': import_main <= STARTUP_BUDGET_S,
+        'main_imports_ms': {entry['module']: round(entry['cumulative_ms'], 1) for entry in phases},
+        'heaviest_packages_ms': {package: round(milliseconds, 1) for package, milliseconds in heaviest},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Number of heaviest packages to list")
+    args = parser.parse_args()
+    print(json.dumps(startup_report(args.runs, args.top), indent=2))
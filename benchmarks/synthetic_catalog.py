@@ -0,0 +1,86 @@
+"""
+benchmarks/synthetic_catalog.py
+
+Generates synthetic catalogs with the same schema as data/sample_database.csv, for
+benchmarking at sizes the real sample doesn't reach. Titles, albums and artists are drawn
+from the words of the sample catalog, so search queries behave like they do on real data;
+albums hold about a dozen tracks and artists about five albums, as in the sample.
+
+Defines:
+    - CATALOG_SIZES: Catalog sizes benchmarked by default.
+    - generate_catalog(size, seed): Returns a synthetic catalog dataframe.
+    - write_catalog(size, directory, seed): Writes a synthetic catalog CSV and its snapshot.
+
+Usage:
+    python -m benchmarks.synthetic_catalog 10000 100000 1000000
+"""
+
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+from utils.snapshot import write_snapshot
+
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+SAMPLE_PATH = 'data/sample_database.csv'
+CATALOG_DIR = 'data/synthetic'
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 5
+TRACK_ID_ALPHABET = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'))
+TRACK_ID_LENGTH = 22  # Same as Spotify ids
+
+
+def _words(values):
+    return sorted({word for value in values for word in re.findall(r'\w+', str(value))})
+
+
+def _names(rng, words, count, max_words):
+    lengths = rng.integers(1, max_words + 1, size=count)
+    picks = rng.choice(words, size=int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [' '.join(picks[bounds[i]:bounds[i + 1]]) for i in range(count)]
+
+
+def generate_catalog(size, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(SAMPLE_PATH)
+
+    album_count = max(1, size // TRACKS_PER_ALBUM)
+    artist_count = max(1, album_count // ALBUMS_PER_ARTIST)
+    albums = np.array(_names(rng, _words(sample['album']), album_count, 3), dtype=object)
+    artists = np.array(_names(rng, _words(sample['artist']), artist_count, 2), dtype=object)
+    images = np.array(sample['image'].unique(), dtype=object)
+
+    # Tracks are grouped by album, and every album belongs to one artist
+    track_albums = np.sort(rng.integers(0, album_count, size=size))
+    album_artists = rng.integers(0, artist_count, size=album_count)
+
+    # Ids are unique since they're drawn from 62**22 values, like Spotify's
+    id_characters = TRACK_ID_ALPHABET[rng.integers(0, len(TRACK_ID_ALPHABET), size=(size, TRACK_ID_LENGTH))]
+    track_ids = [''.join(characters) for characters in id_characters]
+
+    return pd.DataFrame({
+        'track_id': track_ids,
+        'image': images[track_albums % len(images)],
+        'title': _names(rng, _words(sample['title']), size, 4),
+        'album': albums[track_albums],
+        'artist': artists[album_artists[track_albums]],
+        'tempo': np.round(rng.uniform(60, 200, size=size), 3),
+        'genre': rng.choice(sample['genre'].dropna().unique(), size=size),
+    })
+
+
+# Returns the CSV path; the snapshot next to it is what the app loads
+def write_catalog(size, directory=CATALOG_DIR, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'catalog_{size}.csv')
+    catalog = generate_catalog(size, seed)
+    catalog.to_csv(path, index=False)
+    write_snapshot(catalog, os.path.splitext(path)[0] + '.snapshot', path)
+    return path
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or CATALOG_SIZES:
+        print(write_catalog(size))
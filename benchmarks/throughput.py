@@ -0,0 +1,127 @@
+"""
+benchmarks/throughput.py
+
+Measures how many search requests per second a running server handles, at increasing numbers
+of concurrent clients. Each client sends the search callback request the browser sends, cycling
+through a set of queries, so the load is real callback work rather than static files.
+
+With --master-pid, it also reports the memory of each worker forked from that process
+(Linux only). Pss counts shared pages divided among the processes sharing them, so a catalog
+shared copy-on-write shows up as Pss well below Rss, with little Private memory per worker.
+
+To compare cores, start the production server with different worker counts, e.g.
+    WEB_CONCURRENCY=1 gunicorn    then    WEB_CONCURRENCY=4 gunicorn
+and run this against each. Throughput should grow with the workers until it reaches the
+number of cores.
+
+Functions:
+    - measure_throughput(url, concurrency, duration): Runs concurrent clients for a while and summarizes them.
+    - worker_memory(master_pid): Memory of each worker process forked from the master.
+
+Usage:
+    python -m benchmarks.throughput [--url http://127.0.0.1:8000] [--concurrency 1 2 4 8] [--duration 10]
+                                    [--master-pid PID]
+"""
+
+import argparse
+import itertools
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from utils.facets import TEMPO_MIN, TEMPO_MAX
+
+SEARCH_QUERIES = ['love', 'ariana', 'the', 'night', 'troy sivan', 'you', 'dance', 'eternal sunshine']
+SEARCH_OUTPUT = 'search-output.children'
+
+
+# The search callback's output key, as the Dash renderer would send it
+def _search_callback(session, url):
+    dependencies = session.get(f'{url}/_dash-dependencies', timeout=10).json()
+    return next(dependency for dependency in dependencies if SEARCH_OUTPUT in dependency['output'])
+
+
+def _search_request(dependency, query):
+    outputs = [{'id': spec.rsplit('.', 1)[0], 'property': spec.rsplit('.', 1)[1].split('@')[0]}
+               for spec in dependency['output'][2:-2].split('...')]
+    inputs = [{'id': callback_input['id'], 'property': callback_input['property'], 'value': None}
+              for callback_input in dependency['inputs']]
+    state = [{'id': callback_state['id'], 'property': callback_state['property'], 'value': None}
+             for callback_state in dependency['state']]
+    values = {('search-button', 'n_clicks'): 1, ('search-input', 'value'): query, ('search-page', 'data'): {},
+              ('genre-filter', 'value'): [], ('tempo-filter', 'value'): [TEMPO_MIN, TEMPO_MAX]}
+    for value in inputs + state:
+        value['value'] = values.get((value['id'], value['property']))
+    return {'output': dependency['output'], 'outputs': outputs, 'inputs': inputs, 'state': state,
+            'changedPropIds': ['search-button.n_clicks']}
+
+
+def measure_throughput(url, concurrency, duration):
+    with requests.Session() as session:
+        dependency = _search_callback(session, url)
+    bodies = itertools.cycle([_search_request(dependency, query) for query in SEARCH_QUERIES])
+    bodies_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        latencies, errors = [], 0
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                with bodies_lock:
+                    body = next(bodies)
+                start = time.perf_counter()
+                response = session.post(f'{url}/_dash-update-component', json=body, timeout=30)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'median_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+    }
+
+
+def _memory_kb(pid):
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                memory[name] = int(value.split()[0])
+    return {'rss_kb': memory['Rss'], 'pss_kb': memory['Pss'],
+            'private_kb': memory['Private_Clean'] + memory['Private_Dirty']}
+
+
+def worker_memory(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as children:
+        worker_pids = [int(pid) for pid in children.read().split()]
+    return {'master': _memory_kb(master_pid), 'workers': {pid: _memory_kb(pid) for pid in worker_pids}}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument('--master-pid', type=int, help="Report the memory of this server's workers")
+    args = parser.parse_args()
+
+    report = {'url': args.url, 'runs': [measure_throughput(args.url, concurrency, args.duration)
+                                        for concurrency in args.concurrency]}
+    if args.master_pid:
+        report['memory'] = worker_memory(args.master_pid)
+    print(json.dumps(report, indent=2))
@@ -4,7 +4,7 @@ callbacks/__init__.py
 Registers all callback functions for the Dash application by importing and calling registration functions from other callback modules.
 
 Functions:
-    - register_callbacks(app): Registers all callbacks for the app.
+    - register_callbacks(app): Registers all callbacks for the app, instrumented for the /metrics endpoint.
 """
 
 from .input_modal_callbacks import register_input_modal_callbacks
@@ -14,6 +14,8 @@ from .library_page import register_library_page_callbacks
 from .search_page import register_search_page_callbacks
 from .personal_library import register_personal_library_callbacks
 from .page_display import register_page_display_callbacks  # Import the combined display_page callback
+from .library_transfer import register_library_transfer_callbacks
+from utils.metrics import instrument_callbacks
 
 def register_callbacks(app):
     register_input_modal_callbacks(app)
@@ -23,3 +25,5 @@ def register_callbacks(app):
     register_search_page_callbacks(app)
     register_personal_library_callbacks(app)
     register_page_display_callbacks(app)  # Register the combined display_page callback
+    register_library_transfer_callbacks(app)  # Library export and import routes
+    instrument_callbacks(app)  # Per-callback latency and payload metrics, served on /metrics
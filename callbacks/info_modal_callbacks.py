@@ -11,12 +11,10 @@ import dash
 from dash.dependencies import Input, Output, State, ALL
 from dash import callback_context, no_update
 import ast
-import pandas as pd
 from app import app
+from utils.catalog import get_track
 from utils.helpers import modal_attributes_generator, modal_resources_generator
-
-# Load the pre-processed data
-sample_database = pd.read_csv('data/sample_database.csv')
+from utils.library_store import library_store
 
 
 def register_info_modal_callbacks(app):
@@ -25,51 +23,46 @@ def register_info_modal_callbacks(app):
         [
             Output("modal-status", "is_open"),
             Output('modal-attributes', 'children'),
-            Output('modal-resources', 'children')
+            Output('modal-resources', 'children'),
+            Output('modal-track', 'data')
         ],
         [
             Input({'type': 'search-row', 'index': ALL}, 'n_clicks'),
             Input({'type': 'library-row', 'index': ALL}, 'n_clicks'),
             Input({'type': 'edit-icon', 'index': ALL}, 'n_clicks'),
-            Input({'type': 'submit-link', 'index': ALL, 'resource': ALL}, 'n_clicks'),
         ],
         [
             State("modal-status", "is_open"),
-            State('user-library-store', 'data')
+            State('library-session', 'data')
         ],
         prevent_initial_call=True
     )
-    def toggle_update_modal(search_row_clicks, library_row_clicks, edit_icon_clicks, submit_link_clicks, is_open, personal_library):
+    def toggle_update_modal(search_row_clicks, library_row_clicks, edit_icon_clicks, is_open, session):
         ctx = callback_context
         if not ctx.triggered:
-            return is_open, no_update, no_update
+            return is_open, no_update, no_update, no_update
 
         triggered_element = ctx.triggered[0]['prop_id']
         index = ast.literal_eval(triggered_element.split('.')[0])['index']
 
         # Retrieve song data, checking personal library first
-        if personal_library.get(index):
-            song_data = personal_library.get(index)
+        library_entry = library_store.get_entry(session['user_id'], index) if session else None
+        if library_entry:
+            song_data = library_entry
         else:
-            song_data = sample_database[sample_database['track_id'] == index].drop(
-            columns='track_id').iloc[0].to_dict()
+            song_data = get_track(index) or {}
+            song_data.pop('track_id', None)
 
-        # Refresh info modal if submit-link is clicked
-        if any(click > 0 for click in submit_link_clicks):
-            modal_attributes = modal_attributes_generator(song_data)
-            modal_resources = modal_resources_generator(song_data, index) if index in personal_library else []
-            return is_open, modal_attributes, modal_resources
-        
         # Modal content generation based on the song data and whether it is in the library
         if any(click > 0 for click in search_row_clicks + library_row_clicks + edit_icon_clicks):
             if song_data:
                 modal_attributes = modal_attributes_generator(song_data)
                 modal_resources = modal_resources_generator(
-                    song_data, index) if index in personal_library else []
-                return not is_open, modal_attributes, modal_resources
+                    song_data, index) if library_entry else []
+                return not is_open, modal_attributes, modal_resources, index
             else:
-                return not is_open, no_update, no_update
-        return is_open, no_update, no_update
+                return not is_open, no_update, no_update, no_update
+        return is_open, no_update, no_update, no_update
     
     # @app.callback(
     #     [Output("add-tag-button", "style"),
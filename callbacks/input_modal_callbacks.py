@@ -13,6 +13,7 @@ import dash_bootstrap_components as dbc
 import ast
 from app import app
 from utils.helpers import resource_link_suggestion
+from utils.library_store import library_store
 
 
 def register_input_modal_callbacks(app):
@@ -26,15 +27,14 @@ def register_input_modal_callbacks(app):
         ],
         [
             Input({"type": "edit-resource", "index": ALL, "resource": ALL}, "n_clicks"),
-            Input({'type': 'submit-link', 'index': ALL, 'resource': ALL}, "n_clicks"),
         ],
         [
             State("input-modal-status", "is_open"),
-            State("user-library-store", "data")
+            State("library-session", "data")
         ],
         prevent_initial_call=True
     )
-    def toggle_update_input_modal(resource_clicks, submit_clicks, is_open, library_data):
+    def toggle_update_input_modal(resource_clicks, is_open, session):
         ctx = callback_context
         if not ctx.triggered:
             return (is_open, no_update, no_update, no_update)
@@ -44,7 +44,8 @@ def register_input_modal_callbacks(app):
         resource_type = trigger_info["resource"]
         track_id = trigger_info["index"]
 
-        existing_link = library_data[track_id][resource_type]
+        library_entry = library_store.get_entry(session['user_id'], track_id)
+        existing_link = library_entry[resource_type]
 
         input_bar = dbc.Col(
             dbc.Input(
@@ -77,8 +78,8 @@ def register_input_modal_callbacks(app):
             }
         ), key=track_id)
         
-        track_title = library_data[track_id]['title']
-        track_artist = library_data[track_id]['artist']
+        track_title = library_entry['title']
+        track_artist = library_entry['artist']
         suggested_link = resource_link_suggestion(resource_type, track_title, track_artist)
         if suggested_link:
             tooltip_content = suggested_link
@@ -96,9 +97,6 @@ def register_input_modal_callbacks(app):
 
         if any(click > 0 for click in resource_clicks):
             return (not is_open, input_components, input_heading, tooltip_content) # Open the modal if a resource button was clicked
-        
-        elif any(click > 0 for click in submit_clicks):
-            return (False, no_update, no_update, no_update)  # Close the modal if submit was clicked
 
         return (is_open, no_update, no_update, no_update) # Don't change anything if nothing is triggered
 
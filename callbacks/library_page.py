@@ -7,28 +7,77 @@ Functions:
     - register_library_page_callbacks(app): Registers callbacks related to the library page.
 """
 
-from dash.dependencies import Input, Output
-from dash import html, no_update
+from dash.dependencies import Input, Output, State
+from dash import html, no_update, ctx, Patch
 import dash_bootstrap_components as dbc
 from app import app
 from utils.helpers import song_row_generator
-from utils.styles import main_header_style, track_display_style
+from utils.library_store import library_store
+from utils.styles import main_header_style
+
+EMPTY_LIBRARY_MESSAGE = "Your library is empty. Why don't you add some songs?"
+
+
+# A library row, led by the checkbox that selects it for bulk removal
+def library_row(track_id, info):
+    select = dbc.Col(dbc.Checkbox(id={'type': 'library-select', 'index': track_id}, value=False),
+                     width='auto', className='centered')
+    return dbc.Row(
+        [select] + song_row_generator(track_id, info, "library", {track_id: info}),
+        key=track_id,
+        className='library-row'
+    )
 
 
 def register_library_page_callbacks(app):
 
     @app.callback(
-        Output('library-content', 'children'),
-        Input('user-library-store', 'data')
+        [
+            Output('library-content', 'children'),
+            Output('library-rendered', 'data'),
+        ],
+        [
+            Input('user-library-store', 'data'),
+            Input('library-session', 'data')
+        ],
+        State('library-rendered', 'data')
     )
-    def load_library(data):
+    def load_library(library_update, session, rendered):
+        if not session:
+            return EMPTY_LIBRARY_MESSAGE, None
+        user_id = session['user_id']
+        library_update = library_update or {}
+        changed_ids = library_update.get('changed', [])
+        positions = library_update.get('positions', {})
+
+        # Otherwise only touch the rows of the tracks that changed, found by their positions
+        # from before the change: rows still there are replaced, e.g. a resource link was
+        # attached, removed rows are deleted from the last up, and new tracks go last, like in the store.
+        # That's only when the rendered rows are the library at the revision the change was made
+        # to: when another tab changed it in between, they're rendered afresh
+        if (ctx.triggered_id == 'user-library-store' and rendered and rendered['size'] and changed_ids
+                and rendered['revision'] == library_update.get('previous_revision')):
+            now_rendered = {'revision': library_update['revision'], 'size': library_update['size']}
+            if not library_update['size']:
+                return EMPTY_LIBRARY_MESSAGE, now_rendered
+            entries = library_store.get_entries(user_id, changed_ids)
+            removed = sorted((positions[track_id] for track_id in changed_ids
+                              if track_id in positions and track_id not in entries), reverse=True)
+            rows = Patch()
+            for track_id in changed_ids:
+                if track_id in positions and track_id in entries:
+                    rows[positions[track_id]] = library_row(track_id, entries[track_id])
+            for position in removed:
+                del rows[position]
+            for track_id in changed_ids:
+                if track_id not in positions and track_id in entries:
+                    rows.append(library_row(track_id, entries[track_id]))
+            return rows, now_rendered
+
+        # Full render when the app loads or the user key arrives from browser storage,
+        # or when there are no rows to patch
+        revision, data = library_store.get_library_with_revision(user_id)
+        now_rendered = {'revision': revision, 'size': len(data)}
         if not data:
-            return "Your library is empty. Why don't you add some songs?"
-        else:
-            library_rows = [dbc.Row(
-                    song_row_generator(track_id, info, "library", data),
-                    key=track_id,
-                    className='library-row',
-                    style=track_display_style
-                ) for track_id, info in data.items()]
-            return library_rows
+            return EMPTY_LIBRARY_MESSAGE, now_rendered
+        return [library_row(track_id, info) for track_id, info in data.items()], now_rendered
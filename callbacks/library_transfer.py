@@ -0,0 +1,207 @@
+"""
+callbacks/library_transfer.py
+
+Defines the routes that move a personal library in and out of the app as a file, and the
+clientside callbacks connecting the library page's export links and import button to them.
+
+Exports are streamed from the database a batch of rows at a time, and imports are parsed from the
+upload and merged a chunk of rows at a time, each chunk with one batched catalog lookup and one
+transaction, so memory use stays flat however large the library is.
+
+Files are CSV with a header row, or NDJSON (one JSON object per line). Each record needs a track_id,
+and may carry the user's lyrics, chords and sheet_music links; the rest of an exported record is
+informational, since imported tracks take their metadata from the catalog. Unknown track ids and
+rows without one are skipped, and counted in the import's summary.
+
+Both routes identify the library by its user key (the `user_id` the browser keeps in `library-session`)
+and nothing else, like the rest of the app: anyone who knows a user key can export that library or
+import into it. The key is a random UUID, so treat it like a password and don't share export links.
+
+Functions:
+    - export_lines(entries, file_format): Yields library entries as CSV or NDJSON text, a batch at a time.
+    - import_records(user_id, records): Merges imported records into a library, a chunk at a time.
+    - register_library_transfer_callbacks(app): Registers the export and import routes and their callbacks.
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import flask
+from dash.dependencies import Input, Output, State
+from utils.catalog import get_tracks
+from utils.helpers import invalidate_song_rows
+from utils.library_store import library_store, LIBRARY_FIELDS, RESOURCE_FIELDS, EXPORT_BATCH_ROWS
+
+EXPORT_FIELDS = ['track_id'] + LIBRARY_FIELDS
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+IMPORT_CHUNK_ROWS = 500  # Records looked up and merged together
+
+
+def export_lines(entries, file_format):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+    for count, (track_id, entry) in enumerate(entries, start=1):
+        if file_format == 'csv':
+            writer.writerow([track_id] + [entry[field] for field in LIBRARY_FIELDS])
+        else:
+            buffer.write(json.dumps({'track_id': track_id, **entry}) + '\n')
+        # Hand each batch to the server as it's written, so the response is never built whole
+        if count % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# Records from an uploaded file, parsed line by line as it's read
+def _read_records(text, file_format):
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        if reader.fieldnames is not None and 'track_id' not in reader.fieldnames:
+            raise ValueError("The CSV header has no track_id column")
+        yield from reader
+        return
+    for line_number, line in enumerate(text, start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"Line {line_number} is not valid JSON") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_number} is not a JSON object")
+            yield record
+
+
+def import_records(user_id, records):
+    imported = unknown = missing_id = 0
+    while True:
+        rows = list(itertools.islice(records, IMPORT_CHUNK_ROWS))
+        if not rows:
+            return {'imported': imported, 'unknown': unknown, 'missing_id': missing_id}
+        # Rows without a track_id (e.g. blank CSV lines) are counted, not merged
+        chunk = [record for record in rows if record.get('track_id')]
+        missing_id += len(rows) - len(chunk)
+        catalog_tracks = {track['track_id']: track for track in get_tracks([record['track_id'] for record in chunk])}
+        tracks = [
+            {**catalog_tracks[record['track_id']],
+             **{field: str(record.get(field) or '') for field in RESOURCE_FIELDS}}
+            for record in chunk if record['track_id'] in catalog_tracks
+        ]
+        library_store.import_tracks(user_id, tracks)
+        invalidate_song_rows(*(track['track_id'] for track in tracks))
+        imported += len(tracks)
+        unknown += len(chunk) - len(tracks)
+
+
+def register_library_transfer_callbacks(app):
+    server = app.server
+
+    @server.route('/library/export.<file_format>', endpoint='library_export')
+    def library_export(file_format):
+        user_id = flask.request.args.get('user_id')
+        if file_format not in EXPORT_FORMATS:
+            flask.abort(404)
+        if not user_id:
+            flask.abort(400, "user_id is required")
+        return flask.Response(
+            export_lines(library_store.iter_library(user_id), file_format),
+            content_type=EXPORT_FORMATS[file_format],
+            headers={'Content-Disposition': f'attachment; filename=notenotes_library.{file_format}'}
+        )
+
+    # Takes a raw request body (the library page's import button, `curl --data-binary @library.csv`)
+    # or a multipart upload (`curl -F file=@library.csv`). The format comes from ?format=, else
+    # the file extension or content type. Parameters are only read from the query string: reading
+    # them from a form would make Werkzeug parse a raw body sent as urlencoded (curl's default)
+    # into memory, leaving nothing to stream.
+    @server.route('/library/import', methods=['POST'], endpoint='library_import')
+    def library_import():
+        request = flask.request
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return flask.jsonify({'error': "user_id is required"}), 400
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is None:
+                return flask.jsonify({'error': "A multipart upload needs a 'file' field"}), 400
+            stream, filename = upload.stream, upload.filename or ''
+        else:
+            stream, filename = request.stream, None
+        file_format = request.args.get('format')
+        if file_format is None:
+            is_ndjson = (os.path.splitext(filename)[1].lower() in NDJSON_EXTENSIONS
+                         if filename is not None else 'json' in request.mimetype)
+            file_format = 'ndjson' if is_ndjson else 'csv'
+        if file_format not in EXPORT_FORMATS:
+            return flask.jsonify({'error': f"Unknown format: {file_format}"}), 400
+
+        # Records merged before a malformed line stay merged
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            summary = import_records(user_id, _read_records(text, file_format))
+        except (ValueError, csv.Error) as error:
+            return flask.jsonify({'error': str(error)}), 400
+        finally:
+            text.detach()  # The upload's stream belongs to the request
+
+        if not any(summary.values()):
+            return flask.jsonify({'error': "The upload has no records"}), 400
+        return flask.jsonify(summary)
+
+    # The export links carry the browser's user key
+    app.clientside_callback(
+        """
+        function(session) {
+            const userId = session && session.user_id ? encodeURIComponent(session.user_id) : '';
+            return [`/library/export.csv?user_id=${userId}`, `/library/export.ndjson?user_id=${userId}`];
+        }
+        """,
+        [
+            Output('export-csv', 'href'),
+            Output('export-ndjson', 'href'),
+        ],
+        Input('library-session', 'data')
+    )
+
+    # The chosen file is posted from the browser straight to the import route, so it never
+    # passes through a server callback; the page reloads to render the merged library, or
+    # the status shows why the import failed
+    app.clientside_callback(
+        """
+        function(contents, filename, session) {
+            if (!contents || !session || !session.user_id) {
+                return window.dash_clientside.no_update;
+            }
+            const format = /\\.(ndjson|jsonl)$/i.test(filename || '') ? 'ndjson' : 'csv';
+            fetch(contents)
+                .then(file => file.blob())
+                .then(body => fetch(`/library/import?user_id=${encodeURIComponent(session.user_id)}&format=${format}`,
+                                    {method: 'POST', body: body}))
+                .then(response => response.json()
+                    .catch(() => ({error: `the server answered ${response.status} ${response.statusText}`}))
+                    .then(summary => response.ok ? summary : {error: summary.error || `status ${response.status}`}))
+                .catch(error => ({error: error.message}))
+                .then(summary => {
+                    if (summary.error) {
+                        window.dash_clientside.set_props('library-import-status',
+                                                         {children: `Import failed: ${summary.error}`});
+                    } else {
+                        window.location.reload();
+                    }
+                });
+            return `Importing ${filename}...`;
+        }
+        """,
+        Output('library-import-status', 'children'),
+        Input('library-import', 'contents'),
+        [
+            State('library-import', 'filename'),
+            State('library-session', 'data')
+        ],
+        prevent_initial_call=True
+    )
@@ -1,31 +1,21 @@
+"""
+callbacks/metronome.py
 
-import dash
-from dash import html, dcc, Input, Output, State
-import dash_bootstrap_components as dbc
-import time
+Defines the tap-tempo metronome on the home page. The tempo is measured in the browser
+by a clientside callback (assets/metronome.js), so tapping never reaches the server.
 
-def register_metronome_callbacks(app):
+Functions:
+    - register_metronome_callbacks(app): Registers the clientside tap-tempo callback.
+"""
+
+from dash import Input, Output, State, ClientsideFunction
 
-    @app.callback(
+
+def register_metronome_callbacks(app):
+    app.clientside_callback(
+        ClientsideFunction(namespace='metronome', function_name='tap_tempo'),
         Output("tempo-display", "children"),
         Output("tap-times", "data"),
         Input("tap-button", "n_clicks"),
         State("tap-times", "data")
     )
-    def calculate_tempo(n_clicks, tap_times):
-        if n_clicks == 0:
-            return "Tap to set tempo", []
-        
-        # Capture the current time in seconds
-        current_time = time.time()
-        
-        # Append the current time to the list of tap times
-        tap_times.append(current_time)
-        
-        # Calculate the intervals between successive taps and the average tempo
-        if len(tap_times) > 1:
-            intervals = [tap_times[i] - tap_times[i-1] for i in range(1, len(tap_times))]
-            average_interval = sum(intervals) / len(intervals)
-            tempo = 60 / average_interval  # Convert interval to beats per minute (BPM)
-            return f"Tempo: {int(tempo)} BPM", tap_times
-        return "Keep tapping", tap_times
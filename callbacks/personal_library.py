@@ -2,71 +2,153 @@
 callbacks/personal_library.py
 
 Defines callback functions related to managing the personal library in the Dash application.
+Libraries are stored server-side (utils/library_store.py); the browser holds a user key in
+`library-session`, and `user-library-store` only signals which tracks changed, with the
+library store's description of the change (its revisions and the tracks' positions from
+before it), so the library page can patch just their rows.
+Bulk actions (adding all search results or an album, removing the selected library rows)
+look their tracks up in one batch and write them in one transaction.
 
 Functions:
     - register_personal_library_callbacks(app): Registers callbacks related to personal library management.
 """
 
-from dash import callback_context, no_update
+import uuid
+from dash import callback_context, no_update, ctx
 from dash.dependencies import Input, Output, State, ALL
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
 import ast
 from app import app
+from utils.catalog import get_track, get_tracks, album_track_ids, search_track_ids
+from utils.helpers import invalidate_song_rows, modal_resources_generator
+from utils.library_store import library_store
 
-# Load the pre-processed data
-sample_database = pd.read_csv('data/sample_database.csv')
+
+# Tell the pages showing the library which tracks changed, with the change a library_store write returned
+def library_changed(track_ids, change):
+    return {'changed': list(track_ids), **change}
 
 
 def register_personal_library_callbacks(app):
 
+    # Give each browser a user key the first time it opens the app
+    @app.callback(
+        Output('library-session', 'data'),
+        Input('library-session', 'modified_timestamp'),
+        State('library-session', 'data')
+    )
+    def start_library_session(modified_timestamp, session):
+        if session and session.get('user_id'):
+            raise PreventUpdate
+        return {'user_id': uuid.uuid4().hex}
+
     @app.callback(
         Output('user-library-store', 'data'),
-        [
-            Input({'type': 'song-check', 'index': ALL}, 'n_clicks'),
-            Input({'type': 'submit-link', 'index': ALL, 'resource': ALL}, 'n_clicks'),
-        ],
-        [
-            State("input-link", "value"),
-            State('user-library-store', 'data')
-        ]
+        Input({'type': 'song-check', 'index': ALL, 'action': ALL}, 'n_clicks'),
+        State('library-session', 'data')
     )
-    def update_personal_library(song_clicks, 
-                                submit_link_clicks,
-                                input_link,
-                                personal_library):
+    def update_personal_library(song_clicks, session):
         # Determine which actions were performed
         ctx = callback_context
-        if not ctx.triggered:
-            return personal_library
+        if not ctx.triggered or not session:
+            return no_update
+        user_id = session['user_id']
 
         triggered_id = ctx.triggered[0]['prop_id']
         dict_result = ast.literal_eval(triggered_id.split('.')[0]) # Use ast.literal_eval to safely evaluate the string to a dictionary
         track_id = dict_result['index']
-        
-        # Add input link to the correct resource
-        if any(click > 0 for click in submit_link_clicks):
-            resource_type = dict_result['resource']
-            personal_library[track_id][resource_type] = input_link
-            return personal_library
-        
+
         # Add or remove songs to library when add_icon is clicked
-        # if any(click > 0 for click in search_n_clicks + library_n_clicks):
         if any(click > 0 for click in song_clicks):
-            if track_id not in personal_library:
-                song_data = sample_database[sample_database['track_id'] == track_id].iloc[0]
-                personal_library[track_id] = {
-                    'image': song_data['image'],
-                    'title': song_data['title'],
-                    'artist': song_data['artist'],
-                    'album': song_data['album'],
-                    'tempo': song_data['tempo'],
-                    'genre': song_data['genre'],
-                    'lyrics': '',
-                    'chords': '',
-                    'sheet_music': '',
-                }
-                return personal_library
+            invalidate_song_rows(track_id)
+            if dict_result['action'] == 'add':
+                change = library_store.add_track(user_id, get_track(track_id))
             else:  # If check is unchecked, remove song from library
-                    personal_library.pop(track_id, None)
-        return personal_library
+                change = library_store.remove_track(user_id, track_id)
+            return library_changed([track_id], change)
+        return no_update
+
+    # One request per bulk action, whatever the number of tracks. The info modal's resources
+    # are refreshed with it when its track was added or removed, e.g. by "Add album to library".
+    @app.callback(
+        [
+            Output('user-library-store', 'data', allow_duplicate=True),
+            Output('modal-resources', 'children', allow_duplicate=True),
+        ],
+        [
+            Input('add-all-results', 'n_clicks'),
+            Input('add-album', 'n_clicks'),
+            Input('remove-selected', 'n_clicks')
+        ],
+        [
+            State('search-page', 'data'),
+            State('modal-track', 'data'),
+            State({'type': 'library-select', 'index': ALL}, 'value'),
+            State('library-session', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def bulk_update_library(add_results_clicks, add_album_clicks, remove_clicks,
+                            search_page, modal_track, selected, session):
+        if not session or not ctx.triggered_id:
+            raise PreventUpdate
+        user_id = session['user_id']
+
+        if ctx.triggered_id == 'remove-selected':
+            track_ids = [state['id']['index'] for state in ctx.states_list[2] if state.get('value')]
+            if not track_ids:
+                raise PreventUpdate
+            change = library_store.remove_tracks(user_id, track_ids)
+        else:
+            if ctx.triggered_id == 'add-all-results':
+                if not search_page:
+                    raise PreventUpdate
+                # The search's ids come from the query cache, so this doesn't search again
+                _, track_ids, _ = search_track_ids(search_page.get('query', ''), search_page.get('genres'),
+                                                   search_page.get('tempo_range'))
+            else:
+                if not modal_track:
+                    raise PreventUpdate
+                track_ids = album_track_ids(modal_track)
+            # Tracks already in the library keep their links and their rows
+            in_library = library_store.get_entries(user_id, track_ids)
+            track_ids = [track_id for track_id in track_ids if track_id not in in_library]
+            if not track_ids:
+                raise PreventUpdate
+            change = library_store.add_tracks(user_id, get_tracks(track_ids))
+
+        invalidate_song_rows(*track_ids)
+        modal_resources = no_update
+        if modal_track in track_ids:
+            library_entry = library_store.get_entry(user_id, modal_track)
+            modal_resources = modal_resources_generator(library_entry, modal_track) if library_entry else []
+        return library_changed(track_ids, change), modal_resources
+
+    # One request per link submission: save the link, refresh the info modal's
+    # resources, close the input modal and signal the library change together
+    @app.callback(
+        [
+            Output('user-library-store', 'data', allow_duplicate=True),
+            Output('modal-resources', 'children', allow_duplicate=True),
+            Output('input-modal-status', 'is_open', allow_duplicate=True),
+        ],
+        Input({'type': 'submit-link', 'index': ALL, 'resource': ALL}, 'n_clicks'),
+        [
+            State('input-link', 'value'),
+            State('library-session', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def submit_resource_link(submit_link_clicks, input_link, session):
+        if not session or not any(click > 0 for click in submit_link_clicks):
+            raise PreventUpdate
+        user_id = session['user_id']
+        track_id = ctx.triggered_id['index']
+
+        change = library_store.set_resource(user_id, track_id, ctx.triggered_id['resource'], input_link)
+        invalidate_song_rows(track_id)
+
+        library_entry = library_store.get_entry(user_id, track_id)
+        modal_resources = modal_resources_generator(library_entry, track_id) if library_entry else []
+        return library_changed([track_id], change), modal_resources, False
@@ -7,43 +7,123 @@ Functions:
     - register_search_page_callbacks(app): Registers callbacks related to the search page.
 """
 
-from dash import html, dcc, no_update
+from dash import html, dcc, no_update, ctx
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 from app import app
-from utils.helpers import song_row_generator, search_rank
-from utils.styles import main_header_style, track_display_style
-import pandas as pd
+from components.page_components import facet_labels
+from utils.catalog import get_tracks, search_track_ids, SEARCH_RESULT_CAP
+from utils.facets import TEMPO_MIN, TEMPO_MAX
+from utils.helpers import song_row_generator
+from utils.library_store import library_store
+from utils.styles import main_header_style
 
-# Load the pre-processed data
-sample_database = pd.read_csv('data/sample_database.csv')
+SEARCH_PAGE_SIZE = 25  # Rows rendered per page of search results
+LIVE_SEARCH_MIN_LENGTH = 3  # Shorter live queries match most of the catalog; they wait for a submit
 
 
 def register_search_page_callbacks(app):
 
+    # Live search sends every keystroke; otherwise the input only reports on Enter or blur
+    app.clientside_callback(
+        "function(live) { return !live; }",
+        Output('search-input', 'debounce'),
+        Input('live-search-toggle', 'value')
+    )
+
     @app.callback(
-        Output('search-output', 'children'),
+        [
+            Output('search-output', 'children'),
+            Output('search-count', 'children'),
+            Output('search-page', 'data'),
+            Output('search-page-label', 'children'),
+            Output('search-prev', 'disabled'),
+            Output('search-next', 'disabled'),
+            Output('search-facets', 'data'),
+        ],
         [
             Input('search-button', 'n_clicks'),
+            Input('search-input', 'value'),
+            Input('genre-filter', 'value'),
+            Input('tempo-filter', 'value'),
+            Input('search-prev', 'n_clicks'),
+            Input('search-next', 'n_clicks'),
             Input('user-library-store', 'data')
         ],
-        State('search-input', 'value'),
+        [
+            State('live-search-toggle', 'value'),
+            State('search-page', 'data'),
+            State('library-session', 'data')
+        ],
         prevent_initial_call=True
     )
-    def output_search(n_clicks, library_data, value):
-        if n_clicks is None or not value:
+    def output_search(n_clicks, value, genres, tempo_range, prev_clicks, next_clicks, library_update,
+                      live, search_page, session):
+        # A new search or filter starts from the first page; paging and library updates
+        # keep browsing the last submitted query
+        if ctx.triggered_id in ('search-button', 'search-input', 'genre-filter', 'tempo-filter'):
+            query, page = value or '', 0
+        else:
+            query, page = search_page.get('query', ''), search_page.get('page', 0)
+        filtered = bool(genres) or tempo_range not in (None, [TEMPO_MIN, TEMPO_MAX])
+        # The facet counts only change with the query or filters, not when paging or when
+        # the library changes, so the filters' labels are only sent again then
+        searched = (search_page.get('query'), search_page.get('genres'), search_page.get('tempo_range'))
+        search_changed = searched != (query, genres, tempo_range)
+        # Filters alone browse every track they match; with neither a query nor filters,
+        # the results are cleared and the facets go back to counting the whole catalog
+        if not query.strip() and not filtered:
+            return [], None, {}, None, True, True, None if search_page else no_update
+        if ctx.triggered_id == 'search-input' and live and 0 < len(query.strip()) < LIVE_SEARCH_MIN_LENGTH:
             raise PreventUpdate
 
-        raw_search_results = search_rank(value, sample_database)
+        # Match ids and facet counts are cached per query and filters, so paging and typing
+        # on from a cached query don't search the whole catalog again
+        total_matches, track_ids, facets = search_track_ids(query, genres, tempo_range)
+        page_count = max(1, -(-len(track_ids) // SEARCH_PAGE_SIZE))
+
+        if ctx.triggered_id == 'search-prev':
+            page -= 1
+        elif ctx.triggered_id == 'search-next':
+            page += 1
+        page = min(max(page, 0), page_count - 1)
+
+        # Only the visible page's rows are looked up and rendered
+        start = page * SEARCH_PAGE_SIZE
+        page_ids = track_ids[start:start + SEARCH_PAGE_SIZE]
+        library_data = library_store.get_entries(session['user_id'], page_ids) if session else {}
         search_results = [ # formatted as rows
             dbc.Row(
                 song_row_generator(
                 search_result['track_id'], search_result, "search", library_data),
                 key=search_result['track_id'],
-                className='search-row',
-                style=track_display_style
-            ) for search_result in raw_search_results
+                className='search-row'
+            ) for search_result in get_tracks(page_ids)
         ]
 
-        return search_results
+        if total_matches == 0:
+            search_count = "No matches found."
+        else:
+            search_count = f"Showing {start + 1}–{start + len(page_ids)} of {total_matches} matches"
+            if total_matches > SEARCH_RESULT_CAP:
+                search_count += f" (only the top {SEARCH_RESULT_CAP} can be browsed)"
+
+        search_page = {'query': query, 'genres': genres, 'tempo_range': tempo_range, 'page': page}
+        return (search_results, search_count, search_page, f"Page {page + 1} of {page_count}",
+                page == 0, page >= page_count - 1, facets if search_changed else no_update)
+
+    # The filters' labels follow the current search's facet counts. The layout comes with
+    # the whole catalog's, which they go back to when the search is cleared.
+    @app.callback(
+        [
+            Output('genre-filter', 'options'),
+            Output('tempo-facets', 'children'),
+        ],
+        Input('search-facets', 'data'),
+        prevent_initial_call=True
+    )
+    def show_facet_counts(facets):
+        if facets is None:
+            _, _, facets = search_track_ids('')
+        return facet_labels(facets)
@@ -7,7 +7,7 @@ Defines:
     - info_modal: The info modal component.
 """
 
-from dash import html
+from dash import html, dcc
 import dash_bootstrap_components as dbc
 from utils.icons import edit_icon
 from utils.styles import modal_display_style
@@ -26,7 +26,11 @@ info_modal = dbc.Modal(
             html.Div(id="modal-attributes"),
             # Space between attributes and resources
             html.Div(style={"height": "20px"}),
-            html.Div(id="modal-resources")
+            html.Div(id="modal-resources"),
+            html.Div(style={"height": "20px"}),
+            # Adds every track of the shown track's album in one go
+            dbc.Button("Add album to library", id="add-album", n_clicks=0, className="attribute-button"),
+            dcc.Store(id="modal-track")  # Track id of the track shown
         ], style = modal_display_style),
     ],
     id="modal-status",
@@ -0,0 +1,158 @@
+"""
+components/page_components.py
+
+Defines the app's pages. Their component trees never change, so they are built once at import
+and all ship with the initial layout; navigating only switches which page is shown
+(callbacks/page_display.py). Dynamic content is filled in by the page callbacks.
+
+Defines:
+    - home_page: The home page.
+    - library_page: The library page, with its bulk, export and import actions; its rows are rendered
+      into `library-content`, each with a checkbox selecting it for `remove-selected`.
+    - search_page: The search page; results are rendered into `search-output`.
+    - facet_labels(facets): The search filters' options and tempo band counts for a search's facet counts.
+    - label_catalog_facets(): Labels the search filters with the whole catalog's facet counts.
+    - PAGE_IDS: The container id of each page, by URL pathname.
+    - page_containers: The pages, each in a hidden container, for the layout's `page-content`.
+"""
+
+from dash import html, dcc
+import dash_bootstrap_components as dbc
+from utils import catalog
+from utils.facets import TEMPO_MIN, TEMPO_MAX, TEMPO_BAND_WIDTH
+from utils.styles import main_header_style, search_button_style, pagination_style
+
+home_page = html.Div([
+    html.H1('Home', style=main_header_style),
+    dbc.Container([
+        dbc.Row(html.H1("Welcome to NoteNotes!", className="text-center mb-4")),
+        dbc.Row(html.P(
+            "Curate and manage your personal music library all in one place",
+            className="text-lead text-center mb-4"
+        )),
+
+        dbc.Row(html.Div(style={'height': '2px', 'width': '80%', 'background-color': '#E3EBF1', 'margin': '20px 0px 20px 0px'}), className="my-3", justify="center"),
+    
+        dbc.Row([
+            dbc.Col(html.Div([
+                html.H4("Search Songs"),
+                html.P("Find songs by titles, artists, or albums"),
+            ]), width=4),
+            dbc.Col(html.Div([
+                html.H4("Personal Library"),
+                html.P("Save your favorite songs and manage your setlists"),
+            ]), width=4),
+            dbc.Col(html.Div([
+                html.H4("Song Details"),
+                html.P("Store, retrieve, and automate lyrics and sheet music"),
+            ]), width=4),
+        ]),
+        dbc.Row([
+            dbc.Col(dbc.Button("Start Exploring", href="/search", color="primary", className="mt-4"), className="text-center")
+        ]),
+
+        dbc.Row(html.Div(style={'height': '2px', 'width': '80%', 'background-color': '#E3EBF1', 'margin': '20px 0px 20px 0px'}), className="my-3", justify="center"),
+
+        dbc.Container([
+        dbc.Row([
+            dbc.Col(html.Button("Tap", id="tap-button", n_clicks=0, className="btn btn-primary")),
+            dbc.Col(html.Div(id="tempo-display"))
+        ]),
+        dcc.Store(id="tap-times", data=[])
+        ])
+    ], fluid=True, className="py-3")
+])
+
+library_page = html.Div([
+    html.H1('Library', style=main_header_style),
+    html.Div([
+        html.Button("Remove selected", id='remove-selected', n_clicks=0, style=search_button_style),
+        # Export and import go through the routes in callbacks/library_transfer.py
+        html.A("Export CSV", id='export-csv', download='notenotes_library.csv'),
+        html.A("Export NDJSON", id='export-ndjson', download='notenotes_library.ndjson'),
+        dcc.Upload(html.Button("Import", style=search_button_style), id='library-import',
+                   accept='.csv,.ndjson,.jsonl'),
+        html.Span(id='library-import-status'),
+    ], className='library-actions'),
+    html.Div(id='library-content'),
+    dcc.Store(id='library-rendered', data=None)  # Revision and size of the rendered library
+])
+
+# The search filters' labels, filled in by label_catalog_facets() and then show_facet_counts
+genre_filter = dcc.Dropdown(id="genre-filter", options=[], value=[], multi=True, placeholder="All genres",
+                            className="genre-filter")
+tempo_facets = html.Div(id="tempo-facets", className="tempo-facets")
+
+search_page = html.Div([
+    html.H1("Search", style=main_header_style),
+    html.Div([
+        dbc.Input(
+            id="search-input",
+            type="text",
+            placeholder="Search for any song, artist, album",
+            debounce=True,
+            style={
+                'flexGrow': 1,
+                'marginRight': '10px',  # space between input and search button
+            }
+        ),
+        html.Button("Search", id="search-button", style=search_button_style)
+    ], style={
+        'display': 'flex',
+        'flexWrap': 'nowrap',
+        'padding': '10px 0px 10px 0px',
+    }),
+    # Live search runs the query on every keystroke instead of on submit
+    dbc.Switch(id="live-search-toggle", label="Live search", value=False, persistence=True),
+    # Genre and tempo filters; their options show how many of the query's matches each would return
+    html.Div([
+        genre_filter,
+        html.Div([
+            dcc.RangeSlider(
+                id="tempo-filter", min=TEMPO_MIN, max=TEMPO_MAX, step=1, value=[TEMPO_MIN, TEMPO_MAX],
+                marks={bpm: str(bpm) for bpm in range(TEMPO_MIN, TEMPO_MAX + 1, TEMPO_BAND_WIDTH)},
+                tooltip={'placement': 'bottom'}
+            ),
+            tempo_facets,
+        ], className="tempo-filter"),
+    ], className="search-filters"),
+    html.Div([
+        html.Div(id="search-count"),
+        # Adds every browsable result of the current search, filters included
+        html.Button("Add all results", id="add-all-results", n_clicks=0, style=search_button_style),
+    ], style=pagination_style),
+    html.Div(id="search-output"),
+    # Pager for search results; only the current page is rendered
+    html.Div([
+        html.Button("Prev", id="search-prev", disabled=True, style=search_button_style),
+        html.Span(id="search-page-label"),
+        html.Button("Next", id="search-next", disabled=True, style=search_button_style),
+    ], style=pagination_style),
+    dcc.Store(id="search-page", data={}),
+    dcc.Store(id="search-facets")  # Facet counts of the current search
+])
+
+
+# Facet counts label the filter options: every genre in the dropdown, and the tempo
+# bands with matches under the slider
+def facet_labels(facets):
+    genre_options = [{'label': f"{genre} ({count})", 'value': genre} for genre, count in facets['genre'].items()]
+    tempo_bands = " · ".join(f"{low}–{int(low) + TEMPO_BAND_WIDTH} BPM: {count}"
+                             for low, count in facets['tempo'].items() if count)
+    return genre_options, tempo_bands
+
+
+# Before a search, the filters count the whole catalog. They're labelled when the layout is
+# first served rather than at import, so importing the app doesn't load the catalog.
+def label_catalog_facets():
+    if not genre_filter.options:
+        genre_filter.options, tempo_facets.children = facet_labels(catalog.facet_index.catalog_counts)
+
+
+PAGE_IDS = {'/': 'home-page-container', '/library': 'library-page-container', '/search': 'search-page-container'}
+
+# Hidden until the URL is known, so the wrong page never flashes on load
+page_containers = [
+    html.Div(page, id=PAGE_IDS[pathname], style={'display': 'none'})
+    for pathname, page in (('/', home_page), ('/library', library_page), ('/search', search_page))
+]
@@ -0,0 +1,38 @@
+"""
+gunicorn.conf.py
+
+Production serving settings, read by `gunicorn` when it's run from the project root.
+The app is loaded once in the master process (preload_app) and then forked into one
+worker per core, so the catalog is shared copy-on-write across the workers (see wsgi.py).
+
+Environment variables:
+    - PORT: Port to listen on (default 8000).
+    - WEB_CONCURRENCY: Number of worker processes (default: one per core).
+    - NOTENOTES_METRICS_DIR: Where workers keep the callback metrics /metrics sums up
+      (default: a directory under the system temp dir, one per port).
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+wsgi_app = 'wsgi:server'
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Load the app, catalog included, before forking instead of once per worker
+preload_app = True
+
+# Callbacks are short and CPU-bound, so one request at a time per worker process
+worker_class = 'sync'
+timeout = 30
+
+# Set before the app is loaded, so utils.metrics picks it up in every worker
+os.environ.setdefault('NOTENOTES_METRICS_DIR',
+                      os.path.join(tempfile.gettempdir(), f"notenotes-metrics-{os.getenv('PORT', '8000')}"))
+
+
+# Counts from an earlier run of the server don't carry over
+def on_starting(server):
+    shutil.rmtree(os.environ['NOTENOTES_METRICS_DIR'], ignore_errors=True)
@@ -8,21 +8,26 @@ Imports:
     - html, dcc from dash: For creating Dash HTML and core components.
     - dbc from dash_bootstrap_components: For using Bootstrap components in Dash.
     - input_modal, info_modal from components: Modularized components.
+    - page_containers from components: The prebuilt pages.
     - menu_col_style, main_display_style, icon_style, nav_bar_style from styles: Shared styles.
 
 Defines:
     - layout: The layout structure of the Dash application.
+    - serve_layout(): The layout as served on each page load.
 """
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 from components.input_modal_components import input_modal
 from components.info_modal_components import info_modal
 from components.user_components import user_dropdown
+from components.page_components import page_containers, label_catalog_facets
 from utils.styles import banner_style, menu_col_style, main_display_style, icon_style, nav_bar_style
 
 # Define the layout of the app
 layout = html.Div([
-    dcc.Store(id='user-library-store', storage_type='session', data={}),
+    # The library lives server-side; the browser keeps its user key and a change signal
+    dcc.Store(id='library-session', storage_type='local'),
+    dcc.Store(id='user-library-store', data={}),
     dcc.Location(id='url', refresh=False),
     dbc.Container([
         dbc.Row([
@@ -97,10 +102,8 @@ layout = html.Div([
                 ], className="custom-nav", vertical=True, pills=True, style={'width': '100%'}),
             ], style=menu_col_style),  # menu column style
 
-            # Right-side main page
-            dbc.Col([
-
-            ], id='page-content', style=main_display_style),
+            # Right-side main page; every page is in the layout, only the current one is shown
+            dbc.Col(page_containers, id='page-content', style=main_display_style),
         ], style={'height': '100vh', 'margin': '0'}),
     ], fluid=True, style={'height': '100vh', 'padding': '0'}),
     info_modal,
@@ -109,3 +112,10 @@ layout = html.Div([
         dbc.Input(id="input-link", type="text", style={'display': 'none'})  # This input is hidden
     ], id='dummy-div', style={'display': 'none'}),
 ], style={'margin': '0', 'height': '100vh'})
+
+
+# main.py serves the layout through this, so the search filters come labelled with the
+# catalog's facet counts instead of asking for them in a callback
+def serve_layout():
+    label_catalog_facets()
+    return layout
@@ -6,18 +6,28 @@ registers all callbacks, and runs the server.
 
 Imports:
     - app from app: The Dash application instance.
-    - layout from layout: The layout of the app.
+    - serve_layout from layout: Serves the layout of the app.
     - register_callbacks from callbacks: Function to register all callbacks.
 
 Usage:
     Run this script to start the Dash application.
+    Run `python -m benchmarks.startup` to see where startup time goes.
 """
+import os
 from app import app
-from layout import layout
+from layout import serve_layout
 from callbacks import register_callbacks
+from utils import catalog
 
-app.layout = layout
+app.layout = serve_layout
 register_callbacks(app)
 
+DEBUG = True
+
 if __name__ == '__main__':
-    app.run_server(debug=True, port=3000)
+    # The catalog loads while the server starts up, instead of delaying it. In debug mode the
+    # reloader runs this script twice, and only its child (WERKZEUG_RUN_MAIN) serves requests,
+    # so the watching parent doesn't load a catalog of its own.
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        catalog.preload(background=True)
+    app.run_server(debug=DEBUG, port=3000)
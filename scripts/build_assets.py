@@ -0,0 +1,148 @@
+"""
+scripts/build_assets.py
+
+Builds the app's static image assets:
+    - The album-art thumbnail cache: every distinct image in the catalog is downloaded, resized
+      to a square thumbnail in a pool of worker processes, and saved under assets/thumbnails/ as
+      `<content hash>.webp`. A manifest maps each source URL to its thumbnail (utils/thumbnails.py).
+      Re-runs only fetch images missing from the manifest.
+    - The icon sprite: the row icons (utils/icons.py) packed into one image, assets/icon_sprite.png,
+      with the CSS classes that show each cell, assets/icon_sprite.css.
+
+Images that fail to download are left out of the manifest, so rows keep their source URL.
+Pass --catalog a CSV whose images point at a local server (e.g. `python -m http.server`)
+to run the pipeline without the CDN.
+
+Usage (from the project root):
+    python -m scripts.build_assets [--catalog data/sample_database.csv] [--size 100] [--workers 4]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import requests
+from PIL import Image, ImageOps
+
+# Run as `python scripts/build_assets.py` rather than with -m: the project root isn't on the path
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.icons import SPRITE_ICONS, icon_size
+from utils.thumbnails import MANIFEST_PATH, THUMBNAIL_DIR, load_manifest
+
+THUMBNAIL_SIZE = 100  # Pixels; rows show album art at 50px, so this stays sharp on high-DPI screens
+THUMBNAIL_QUALITY = 80
+DOWNLOAD_WORKERS = 8
+REQUEST_TIMEOUT = 10  # Seconds
+
+ASSETS_DIR = 'assets'
+SPRITE_PATH = os.path.join(ASSETS_DIR, 'icon_sprite.png')
+SPRITE_CSS_PATH = os.path.join(ASSETS_DIR, 'icon_sprite.css')
+SPRITE_SCALE = 2  # Cells are drawn at twice the displayed size, for high-DPI screens
+
+
+def fetch_image(session, url):
+    try:
+        result = session.get(url, timeout=REQUEST_TIMEOUT)
+        result.raise_for_status()
+        return result.content
+    except requests.RequestException as error:
+        print(f"Skipping {url}: {error}")
+        return None
+
+
+# Runs in a worker process: decode, crop to a centered square, resize, re-encode
+def resize_image(image_bytes, size=THUMBNAIL_SIZE):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        thumbnail = ImageOps.fit(image.convert('RGB'), (size, size), Image.LANCZOS)
+    output = io.BytesIO()
+    thumbnail.save(output, 'WEBP', quality=THUMBNAIL_QUALITY)
+    return output.getvalue()
+
+
+def build_thumbnails(image_urls, directory=THUMBNAIL_DIR, size=THUMBNAIL_SIZE, max_workers=None):
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, os.path.basename(MANIFEST_PATH))
+    manifest = load_manifest(manifest_path)
+
+    def is_cached(url):
+        return url in manifest and os.path.exists(os.path.join(directory, manifest[url]))
+
+    pending = [url for url in dict.fromkeys(image_urls) if isinstance(url, str) and url and not is_cached(url)]
+
+    # Downloads wait on the network, so threads; resizing is CPU-bound, so processes
+    with requests.Session() as session, \
+            ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads, \
+            ProcessPoolExecutor(max_workers=max_workers) as resizers:
+        resized = {}
+        for url, image_bytes in zip(pending, downloads.map(lambda url: fetch_image(session, url), pending)):
+            if image_bytes is not None:
+                resized[url] = resizers.submit(resize_image, image_bytes, size)
+
+        for url, future in resized.items():
+            try:
+                thumbnail = future.result()
+            except (OSError, Image.DecompressionBombError) as error:  # Not a readable image
+                print(f"Skipping {url}: {error}")
+                continue
+            # Identical images share one file, and a changed image gets a new name,
+            # so browsers can cache thumbnails indefinitely
+            name = hashlib.sha256(thumbnail).hexdigest()[:16] + '.webp'
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                with open(path, 'wb') as thumbnail_file:
+                    thumbnail_file.write(thumbnail)
+            manifest[url] = name
+
+    # Write then rename, so the app never reads a half-written manifest
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def build_icon_sprite(icons=SPRITE_ICONS, sprite_path=SPRITE_PATH, css_path=SPRITE_CSS_PATH):
+    display_size = int(icon_size.rstrip('px'))
+    cell_size = display_size * SPRITE_SCALE
+    sprite = Image.new('RGBA', (cell_size * len(icons), cell_size), (0, 0, 0, 0))
+    css_rules = [
+        "/* assets/icon_sprite.css, generated by scripts/build_assets.py */",
+        "",
+        ".sprite-icon {",
+        "    display: inline-block;",
+        f"    width: {display_size}px;",
+        f"    height: {display_size}px;",
+        "    background-image: url('/assets/icon_sprite.png');",
+        f"    background-size: {display_size * len(icons)}px {display_size}px;",
+        "    background-repeat: no-repeat;",
+        "    vertical-align: middle;",
+        "}",
+    ]
+    for cell, (name, source) in enumerate(icons.items()):
+        # Each icon is scaled to fit its square cell and centered in it
+        with Image.open(os.path.join(ASSETS_DIR, source)) as icon:
+            icon = ImageOps.contain(icon.convert('RGBA'), (cell_size, cell_size), Image.LANCZOS)
+        sprite.paste(icon, (cell * cell_size + (cell_size - icon.width) // 2, (cell_size - icon.height) // 2))
+        css_rules.append(f".sprite-icon-{name} {{ background-position: {-cell * display_size}px 0; }}")
+
+    sprite.save(sprite_path, optimize=True)
+    with open(css_path, 'w', encoding='utf-8') as css_file:
+        css_file.write('\n'.join(css_rules) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', default=os.getenv('NOTENOTES_CATALOG', 'data/sample_database.csv'))
+    parser.add_argument('--size', type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="Resizing processes (default: one per core)")
+    args = parser.parse_args()
+
+    build_icon_sprite()
+    manifest = build_thumbnails(pd.read_csv(args.catalog, usecols=['image'])['image'].tolist(),
+                                size=args.size, max_workers=args.workers)
+    print(f"{len(manifest)} thumbnails in {THUMBNAIL_DIR}")
@@ -1,95 +1,281 @@
 """
-prepare_data.py
+scripts/prepare_data.py
 
-This script populates a sample database with track information from the Spotify API and saves it to a CSV file.
-It uses environment variables for the Spotify API credentials.
+Builds data/sample_database.csv from the Spotify Web API.
 
-Functions:
-    - get_token(): Retrieves an access token from the Spotify API.
-    - populate_tracks(sample_albums): Populates a DataFrame with track information from the specified albums.
+Requests go through one pooled HTTP session shared by a bounded pool of worker threads.
+Tempos are fetched with the batched audio-features endpoint (up to 100 ids per call),
+the access token is cached until shortly before it expires, and rate limiting (429)
+is handled by waiting for the `Retry-After` interval.
 
-Environment Variables:
-    - CLIENT_ID: Spotify API client ID.
-    - CLIENT_SECRET: Spotify API client secret.
+Ingestion is resumable: every API response is kept in a content-addressed on-disk cache,
+and each album is checkpointed as soon as its tracks and tempos are known. A re-run skips
+checkpointed albums and cached calls, so only new albums are fetched. Delete
+data/ingest_cache/ to force a full re-crawl.
 
-Steps:
-    1. Load environment variables for Spotify API credentials.
-    2. Define a function to get an access token from Spotify.
-    3. Define a function to populate a DataFrame with track data from specified albums.
-    4. Create a list of sample albums.
-    5. Populate the sample database with track data.
-    6. Save the populated DataFrame to 'sample_database.csv'.
+Set SPOTIFY_API_URL and SPOTIFY_ACCOUNTS_URL to run ingestion against a local stub server.
 
-Example:
-    $ python prepare_data.py
+Usage (from the project root):
+    python -m scripts.prepare_data  # or python scripts/prepare_data.py
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
+import sys
 import base64
-from requests import post, get
+import hashlib
 import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 
+# Run as `python scripts/prepare_data.py` rather than with -m: the project root isn't on the path
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.snapshot import write_snapshot
+
 # Load environment variables
 load_dotenv()
 client_id = os.getenv("CLIENT_ID")
 client_secret = os.getenv("CLIENT_SECRET")
 
-# Function to get token from Spotify API
-def get_token():
-    auth_string = client_id + ":" + client_secret
-    auth_bytes = auth_string.encode("utf-8")
-    auth_base64 = str(base64.b64encode(auth_bytes), "utf-8")
-    url = "https://accounts.spotify.com/api/token"
-    headers = {
-        "Authorization": "Basic " + auth_base64,
-        "Content-Type": "application/x-www-form-urlencoded"
-    }
-    data = {"grant_type": "client_credentials"}
-    result = post(url, headers=headers, data=data)
-    json_result = json.loads(result.content)
-
-    return json_result["access_token"]
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+
+MAX_WORKERS = 8  # Concurrent requests, and the size of the connection pool
+AUDIO_FEATURES_BATCH_SIZE = 100  # Most ids the audio-features endpoint accepts per call
+ALBUM_TRACKS_PAGE_SIZE = 50  # Most tracks the album tracks endpoint returns per call
+MAX_RATE_LIMIT_RETRIES = 5
+REQUEST_TIMEOUT = 10  # Seconds
+TOKEN_EXPIRY_MARGIN = 60  # Refresh the token this many seconds before Spotify expires it
+
+INGEST_CACHE_DIR = 'data/ingest_cache'
+RESPONSE_CACHE_DIR = os.path.join(INGEST_CACHE_DIR, 'responses')
+CHECKPOINT_PATH = os.path.join(INGEST_CACHE_DIR, 'checkpoint.jsonl')
+
+
+# API responses on disk, addressed by a hash of the endpoint and the id they were fetched for
+class ResponseCache:
+    def __init__(self, directory=RESPONSE_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, endpoint, key):
+        digest = hashlib.sha256(f"{endpoint}\n{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, endpoint, key):
+        try:
+            with open(self._path(endpoint, key), encoding="utf-8") as cached:
+                return json.load(cached)
+        except FileNotFoundError:
+            return None
+
+    def put(self, endpoint, key, value):
+        path = self._path(endpoint, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated entry behind
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cached:
+            json.dump(value, cached)
+        os.replace(temporary_path, path)
+
+
+# Completed albums, one JSON line per album, appended as ingestion goes
+class IngestCheckpoint:
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+
+    def load(self):
+        completed = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as checkpoint:
+                for line in checkpoint:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:  # Partial line from an interrupted run
+                        continue
+                    completed[entry["album"]] = entry["tracks"]
+        return completed
+
+    def save(self, album, tracks):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, "ab+") as checkpoint:
+            # Start a new line after a partial one, or this entry would be lost with it
+            if checkpoint.seek(0, os.SEEK_END):
+                checkpoint.seek(-1, os.SEEK_END)
+                if checkpoint.read(1) != b"\n":
+                    checkpoint.write(b"\n")
+            checkpoint.write((json.dumps({"album": album, "tracks": tracks}) + "\n").encode("utf-8"))
+
+
+class SpotifyClient:
+    def __init__(self, client_id, client_secret, api_url=SPOTIFY_API_URL,
+                 accounts_url=SPOTIFY_ACCOUNTS_URL, pool_size=MAX_WORKERS, cache=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip('/')
+        self.accounts_url = accounts_url.rstrip('/')
+        self.cache = cache
+
+        # One keep-alive connection pool for every worker; connection errors and
+        # server errors are retried with backoff, rate limits are handled in get()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504],
+                      allowed_methods=['GET', 'POST'], respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+    # Get a token from the Spotify API, reusing it until it is about to expire
+    def get_token(self):
+        with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires_at:
+                auth_string = self.client_id + ":" + self.client_secret
+                auth_base64 = str(base64.b64encode(auth_string.encode("utf-8")), "utf-8")
+                headers = {
+                    "Authorization": "Basic " + auth_base64,
+                    "Content-Type": "application/x-www-form-urlencoded"
+                }
+                data = {"grant_type": "client_credentials"}
+                result = self.session.post(f"{self.accounts_url}/api/token", headers=headers,
+                                           data=data, timeout=REQUEST_TIMEOUT)
+                result.raise_for_status()
+                json_result = result.json()
+                self._token = json_result["access_token"]
+                self._token_expires_at = (time.monotonic() + json_result.get("expires_in", 3600)
+                                          - TOKEN_EXPIRY_MARGIN)
+            return self._token
+
+    def expire_token(self):
+        with self._token_lock:
+            self._token = None
+
+    def get(self, path, params=None):
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            headers = {"Authorization": "Bearer " + self.get_token()}
+            result = self.session.get(f"{self.api_url}/{path}", headers=headers,
+                                      params=params, timeout=REQUEST_TIMEOUT)
+            if result.status_code == 429:  # Rate limited: wait as long as Spotify asks
+                time.sleep(float(result.headers.get("Retry-After", 1)))
+                continue
+            if result.status_code == 401:  # Token revoked or expired early
+                self.expire_token()
+                continue
+            result.raise_for_status()
+            return result.json()
+        raise RuntimeError(f"Spotify API kept refusing {path} after {MAX_RATE_LIMIT_RETRIES} retries")
+
+    # get(), answered from the response cache when this endpoint and id were fetched before
+    def get_cached(self, endpoint, key, path, params=None):
+        if self.cache is not None:
+            cached = self.cache.get(endpoint, key)
+            if cached is not None:
+                return cached
+        result = self.get(path, params)
+        if self.cache is not None:
+            self.cache.put(endpoint, key, result)
+        return result
+
+
+# Search for an album and return its tracks (without tempo)
+def fetch_album_tracks(client, album):
+    album_search_json_result = client.get_cached("search", album, "search",
+                                                 params={"q": album, "type": "album", "limit": 1})
+    if not album_search_json_result['albums']['items']:
+        return []
+    album_id = album_search_json_result["albums"]["items"][0]["id"]
+
+    album_result = client.get_cached("albums", album_id, f"albums/{album_id}")
+    # Images are listed largest first; use the 64px one, or the smallest there is
+    images = album_result['images']
+    album_art = images[2]['url'] if len(images) > 2 else (images[-1]['url'] if images else '')
+
+    # The album object carries the first page of tracks; page through the rest
+    tracks_page = album_result["tracks"]
+    tracks = list(tracks_page["items"])
+    while tracks_page.get("next"):
+        offset = len(tracks)
+        tracks_page = client.get_cached("album-tracks", f"{album_id}:{offset}", f"albums/{album_id}/tracks",
+                                        params={"offset": offset, "limit": ALBUM_TRACKS_PAGE_SIZE})
+        tracks.extend(tracks_page["items"])
+
+    return [{
+        'track_id': track["id"], 'image': album_art, 'title': track["name"],
+        'album': album, 'artist': track["artists"][0]["name"]
+    } for track in tracks]
+
+
+# Fetch tempos for many tracks, up to 100 ids per audio-features call.
+# Features are cached per track, so only uncached ids are requested.
+def fetch_tempos(client, track_ids, executor):
+    tempos = {}
+    missing_ids = []
+    for track_id in track_ids:
+        cached = client.cache.get("audio-features", track_id) if client.cache is not None else None
+        if cached is not None:
+            tempos[track_id] = cached["tempo"]
+        else:
+            missing_ids.append(track_id)
+
+    batches = [missing_ids[start:start + AUDIO_FEATURES_BATCH_SIZE]
+               for start in range(0, len(missing_ids), AUDIO_FEATURES_BATCH_SIZE)]
+    results = executor.map(lambda batch: client.get("audio-features", params={"ids": ",".join(batch)}), batches)
+    for result in results:
+        for features in result["audio_features"]:
+            if not features:
+                continue
+            tempos[features["id"]] = features["tempo"]
+            if client.cache is not None:
+                client.cache.put("audio-features", features["id"], features)
+    return tempos
+
 
 # Create function to populate sample database using Spotify API
-def populate_tracks(sample_albums):
-    token = get_token()
-    headers = {"Authorization": "Bearer " + token}
-    for album in sample_albums:
-        url = f"https://api.spotify.com/v1/search?q={album}&type=album&limit=1"
-        result = get(url, headers=headers)
-        album_search_json_result = json.loads(result.content)
-        if not album_search_json_result['albums']['items']:
-            continue
-        album_id = album_search_json_result["albums"]["items"][0]["id"]
-        
-        album_url = f"https://api.spotify.com/v1/albums/{album_id}"
-        album_result = json.loads(get(album_url, headers=headers).content)
-        album_art = album_result['images'][2]['url']
-
-        tracks_url = f"https://api.spotify.com/v1/albums/{album_id}/tracks"
-        tracks_result = get(tracks_url, headers=headers)
-        tracks = json.loads(tracks_result.content)["items"]
-
-        for track in tracks:
-            track_id = track["id"]
-            image = album_art
-            title = track["name"]
-            artist = track["artists"][0]["name"]
-
-            # Fetch tempo from audio features endpoint
-            audio_features_url = f"https://api.spotify.com/v1/audio-features/{
-                track_id}"
-            audio_features_result = get(audio_features_url, headers=headers)
-            tempo = json.loads(audio_features_result.content)["tempo"]
-
-            track_data = {
-                'track_id': track_id, 'image': image, 'title': title,
-                'album': album, 'artist': artist, 'tempo': tempo
-            }
-            sample_database.loc[len(sample_database)] = track_data
-    return sample_database
+def populate_tracks(sample_albums, client=None, max_workers=MAX_WORKERS, checkpoint=None):
+    if client is None:
+        client = SpotifyClient(client_id, client_secret, pool_size=max_workers, cache=ResponseCache())
+    if checkpoint is None:
+        checkpoint = IngestCheckpoint()
+
+    # Albums finished by an earlier run are not fetched again
+    completed = checkpoint.load()
+    pending_albums = [album for album in sample_albums if album not in completed]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Albums whose tracks are known but whose tempos are not yet
+        awaiting_tempo = []
+
+        # Fetch tempos for the waiting albums in shared batches, then checkpoint each album
+        def complete_albums():
+            track_ids = [track['track_id'] for _, tracks in awaiting_tempo for track in tracks]
+            tempos = fetch_tempos(client, track_ids, executor)
+            for album, tracks in awaiting_tempo:
+                for track in tracks:
+                    track['tempo'] = tempos.get(track['track_id'])
+                checkpoint.save(album, tracks)
+                completed[album] = tracks
+            awaiting_tempo.clear()
+
+        # map() keeps album order, so rows come out in the same order on every run
+        album_tracks = executor.map(lambda album: fetch_album_tracks(client, album), pending_albums)
+        for album, tracks in zip(pending_albums, album_tracks):
+            awaiting_tempo.append((album, tracks))
+            if sum(len(tracks) for _, tracks in awaiting_tempo) >= AUDIO_FEATURES_BATCH_SIZE:
+                complete_albums()
+        complete_albums()
+
+    tracks = [track for album in sample_albums for track in completed.get(album, [])]
+    return pd.DataFrame(tracks, columns=['track_id', 'image', 'title', 'album', 'artist', 'tempo'])
+
 
 # List of albums to populate sample database
 sample_albums = [
@@ -100,12 +286,12 @@ sample_albums = [
     "Never Enough", "Freudian"
 ]
 
-# Populate the sample database
-sample_database = pd.DataFrame(
-columns=['track_id', 'image', 'title', 'album', 'artist', 'tempo'])
-sample_database = populate_tracks(sample_albums)
-genres = pd.read_csv('data/genres.csv')
-sample_database['genre'] = genres['genre']
+if __name__ == '__main__':
+    # Populate the sample database
+    sample_database = populate_tracks(sample_albums)
+    genres = pd.read_csv('data/genres.csv')
+    sample_database['genre'] = genres['genre']
 
-# Save the DataFrame to a CSV file
-sample_database.to_csv('data/sample_database.csv', index=False)
+    # Save the DataFrame to a CSV file, plus the binary snapshot the app memory-maps on load
+    sample_database.to_csv('data/sample_database.csv', index=False)
+    write_snapshot(sample_database, 'data/sample_database.snapshot', 'data/sample_database.csv')
@@ -0,0 +1,34 @@
+"""
+tests/conftest.py
+
+Shared test setup. Libraries written by the tests go to a throwaway database, chosen before
+any test imports the app, and `stub_server` serves local stand-ins for the HTTP services the
+scripts call.
+"""
+
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+
+os.environ.setdefault('NOTENOTES_LIBRARY_DB', os.path.join(tempfile.mkdtemp(), 'library.db'))
+
+
+# Starts a local HTTP server for a request handler class and returns its URL; the servers
+# are shut down after the test
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(handler):
+        quiet_handler = type(handler.__name__, (handler,), {'log_message': lambda self, *args: None})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), quiet_handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,103 @@
+"""
+tests/test_build_assets.py
+
+Tests for the thumbnail cache built by scripts/build_assets.py, run against a local image
+server: content-hash file names, and which images are downloaded again on a rebuild.
+"""
+
+import hashlib
+import io
+import json
+import os
+from http.server import BaseHTTPRequestHandler
+import pytest
+from PIL import Image
+from scripts.build_assets import build_thumbnails
+
+THUMBNAIL_SIZE = 16
+
+
+def _png(color, size=(40, 30)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG')
+    return output.getvalue()
+
+
+# A local image CDN, served by `start_server` (the stub_server fixture), serving `images`
+# ({path: bytes}) and recording the paths requested
+class StubImageServer:
+    def __init__(self, start_server, images):
+        self.images = images
+        self.requested = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requested.append(self.path)
+                body = stub.images.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+        self.url = start_server(Handler)
+
+
+@pytest.fixture
+def images(stub_server):
+    return StubImageServer(stub_server, {
+        '/red.png': _png('red'),
+        '/red-again.png': _png('red'),  # The same picture at another URL
+        '/blue.png': _png('blue', (30, 40)),
+        '/not-an-image.png': b'<html>Not found</html>',
+    })
+
+
+def _build(images, directory, paths):
+    return build_thumbnails([images.url + path if path else path for path in paths], directory=str(directory),
+                            size=THUMBNAIL_SIZE, max_workers=1)
+
+
+def test_thumbnails_are_named_by_their_content(images, tmp_path):
+    manifest = _build(images, tmp_path, ['/red.png', '/red-again.png', '/blue.png'])
+
+    for name in manifest.values():
+        with open(tmp_path / name, 'rb') as thumbnail_file:
+            thumbnail = thumbnail_file.read()
+        assert name == hashlib.sha256(thumbnail).hexdigest()[:16] + '.webp'
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            assert image.size == (THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+    # Identical images share a file
+    assert manifest[images.url + '/red.png'] == manifest[images.url + '/red-again.png']
+    assert manifest[images.url + '/red.png'] != manifest[images.url + '/blue.png']
+    assert sorted(os.listdir(tmp_path)) == sorted(set(manifest.values()) | {'manifest.json'})
+    with open(tmp_path / 'manifest.json', encoding='utf-8') as manifest_file:
+        assert json.load(manifest_file) == manifest
+
+
+def test_unavailable_images_are_left_out(images, tmp_path):
+    manifest = _build(images, tmp_path, ['/red.png', '/missing.png', '/not-an-image.png', None, ''])
+
+    assert list(manifest) == [images.url + '/red.png']
+
+
+def test_cached_thumbnails_are_not_downloaded_again(images, tmp_path):
+    first = _build(images, tmp_path, ['/red.png', '/blue.png'])
+    images.requested.clear()
+
+    second = _build(images, tmp_path, ['/red.png', '/blue.png', '/red-again.png'])
+
+    assert images.requested == ['/red-again.png']
+    assert {url: second[url] for url in first} == first
+
+
+def test_missing_thumbnail_files_are_rebuilt(images, tmp_path):
+    first = _build(images, tmp_path, ['/red.png', '/blue.png'])
+    os.remove(tmp_path / first[images.url + '/blue.png'])
+    images.requested.clear()
+
+    second = _build(images, tmp_path, ['/red.png', '/blue.png'])
+
+    assert images.requested == ['/blue.png']
+    assert second == first
+    assert os.path.exists(tmp_path / second[images.url + '/blue.png'])
@@ -0,0 +1,119 @@
+"""
+tests/test_library_transfer.py
+
+Tests for the library export and import routes in callbacks/library_transfer.py, through the
+app's Flask test client: raw, urlencoded and multipart uploads, CSV and NDJSON, and round trips.
+"""
+
+import csv
+import io
+import json
+import uuid
+import pytest
+from main import app
+from utils import catalog
+
+
+@pytest.fixture
+def client():
+    return app.server.test_client()
+
+
+@pytest.fixture
+def user_id():
+    return uuid.uuid4().hex
+
+
+@pytest.fixture
+def track_ids():
+    return catalog.sample_database['track_id'][:3].tolist()
+
+
+def _csv(rows, fields=('track_id', 'lyrics')):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(fields)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def _import(client, user_id, body, content_type, file_format=None):
+    query = f'user_id={user_id}' + (f'&format={file_format}' if file_format else '')
+    return client.post(f'/library/import?{query}', data=body, content_type=content_type)
+
+
+def _export(client, user_id, file_format):
+    response = client.get(f'/library/export.{file_format}?user_id={user_id}')
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_raw_csv_body_is_imported(client, user_id, track_ids):
+    body = _csv([(track_id, f'https://lyrics/{track_id}') for track_id in track_ids] + [('not-a-track', '')])
+    response = _import(client, user_id, body, 'text/csv')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'imported': 3, 'unknown': 1, 'missing_id': 0}
+    exported = list(csv.DictReader(io.StringIO(_export(client, user_id, 'csv'))))
+    assert [row['track_id'] for row in exported] == track_ids
+    assert [row['lyrics'] for row in exported] == [f'https://lyrics/{track_id}' for track_id in track_ids]
+
+
+def test_urlencoded_body_is_read_as_the_file(client, user_id, track_ids):
+    # curl --data-binary sends this content type; the body must not be parsed as a form
+    response = _import(client, user_id, _csv([(track_id, '') for track_id in track_ids]),
+                       'application/x-www-form-urlencoded', 'csv')
+
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 3
+
+
+def test_multipart_upload_takes_the_format_from_the_file_name(client, user_id, track_ids):
+    body = ''.join(json.dumps({'track_id': track_id, 'chords': 'https://chords'}) + '\n' for track_id in track_ids)
+    response = client.post(f'/library/import?user_id={user_id}',
+                           data={'file': (io.BytesIO(body.encode('utf-8')), 'library.ndjson')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 3
+    exported = [json.loads(line) for line in _export(client, user_id, 'ndjson').splitlines()]
+    assert [record['chords'] for record in exported] == ['https://chords'] * 3
+
+
+def test_ndjson_body_counts_records_without_a_track_id(client, user_id, track_ids):
+    body = '\n'.join([json.dumps({'track_id': track_ids[0]}), json.dumps({'lyrics': 'https://lyrics'}), ''])
+    response = _import(client, user_id, body, 'application/x-ndjson')
+
+    assert response.get_json() == {'imported': 1, 'unknown': 0, 'missing_id': 1}
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'ndjson'])
+def test_export_round_trips_through_import(client, user_id, track_ids, file_format):
+    _import(client, user_id, _csv([(track_id, f'https://lyrics/{track_id}') for track_id in track_ids]), 'text/csv')
+    exported = _export(client, user_id, file_format)
+
+    copy_user = uuid.uuid4().hex
+    response = _import(client, copy_user, exported, 'text/plain', file_format)
+
+    assert response.get_json()['imported'] == 3
+    assert _export(client, copy_user, file_format) == exported
+
+
+@pytest.mark.parametrize('body, content_type, error', [
+    ('', 'text/csv', "no records"),
+    ('', 'application/x-www-form-urlencoded', "no records"),
+    ('title,artist\nSong,Singer\n', 'text/csv', "track_id"),
+    ('{"track_id": \n', 'application/x-ndjson', "not valid JSON"),
+])
+def test_unusable_uploads_are_rejected(client, user_id, body, content_type, error):
+    response = _import(client, user_id, body, content_type)
+
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def test_multipart_upload_without_a_file_is_rejected(client, user_id):
+    response = client.post(f'/library/import?user_id={user_id}', data={'other': 'value'},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
@@ -0,0 +1,153 @@
+"""
+tests/test_prepare_data.py
+
+Tests for the Spotify ingestion in scripts/prepare_data.py, run against a local stub of the
+Spotify API: rate limiting, token refresh, and resuming from the checkpoint and response cache.
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+import pytest
+from scripts import prepare_data
+from scripts.prepare_data import SpotifyClient, ResponseCache, IngestCheckpoint, populate_tracks
+
+ALBUMS = {'First Album': ['first-1', 'first-2'], 'Second Album': ['second-1', 'second-2', 'second-3']}
+
+
+# A local Spotify API, served by `start_server` (the stub_server fixture): `respond(request)`
+# answers each GET with (status, body, headers), and every request is recorded as
+# {'method', 'path', 'query', 'token'}
+class StubSpotify:
+    def __init__(self, start_server):
+        self.requests = []
+        self.tokens_issued = 0
+        self.respond = self.catalog_response
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, body, headers=()):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _record(self, method):
+                url = urlparse(self.path)
+                request = {'method': method, 'path': unquote(url.path),
+                           'query': {key: values[0] for key, values in parse_qs(url.query).items()},
+                           'token': self.headers.get('Authorization', '').removeprefix('Bearer ')}
+                stub.requests.append(request)
+                return request
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._record('POST')
+                stub.tokens_issued += 1
+                self._send(200, {'access_token': f'token-{stub.tokens_issued}', 'expires_in': 3600})
+
+            def do_GET(self):
+                self._send(*stub.respond(self._record('GET')))
+
+        self.url = start_server(Handler)
+
+    def client(self, cache=None):
+        return SpotifyClient('client-id', 'client-secret', api_url=f'{self.url}/v1', accounts_url=self.url,
+                             pool_size=2, cache=cache)
+
+    def gets(self):
+        return [request for request in self.requests if request['method'] == 'GET']
+
+    # Search, album and audio-features answers for ALBUMS
+    @staticmethod
+    def catalog_response(request):
+        path, query = request['path'], request['query']
+        if path == '/v1/search':
+            album = query['q']
+            return 200, {'albums': {'items': [{'id': album}] if album in ALBUMS else []}}
+        if path.startswith('/v1/albums/'):
+            album = path.split('/')[3]
+            tracks = [{'id': track_id, 'name': f'Song {track_id}', 'artists': [{'name': 'Artist'}]}
+                      for track_id in ALBUMS[album]]
+            return 200, {'images': [{'url': f'http://images/{album}/64'}], 'tracks': {'items': tracks, 'next': None}}
+        if path == '/v1/audio-features':
+            return 200, {'audio_features': [{'id': track_id, 'tempo': 120.0} for track_id in query['ids'].split(',')]}
+        return 404, {}
+
+
+@pytest.fixture
+def spotify(stub_server):
+    return StubSpotify(stub_server)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+    monkeypatch.setattr(prepare_data.time, 'sleep', waited.append)
+    return waited
+
+
+def test_rate_limited_request_waits_for_retry_after(spotify, sleeps):
+    responses = iter([(429, {}, [('Retry-After', '3')]), (200, {'ok': True})])
+    spotify.respond = lambda request: next(responses)
+
+    assert spotify.client().get('search') == {'ok': True}
+    assert sleeps == [3.0]
+    assert len(spotify.gets()) == 2
+
+
+def test_rate_limiting_gives_up_after_the_retries(spotify, sleeps):
+    spotify.respond = lambda request: (429, {}, [('Retry-After', '1')])
+
+    with pytest.raises(RuntimeError):
+        spotify.client().get('search')
+    assert len(spotify.gets()) == prepare_data.MAX_RATE_LIMIT_RETRIES + 1
+
+
+def test_rejected_token_is_refreshed(spotify):
+    # The first token is revoked early; requests with any other token succeed
+    spotify.respond = lambda request: (401, {}) if request['token'] == 'token-1' else (200, {'ok': True})
+    client = spotify.client()
+
+    assert client.get('search') == {'ok': True}
+    assert [request['token'] for request in spotify.gets()] == ['token-1', 'token-2']
+    assert spotify.tokens_issued == 2
+
+    # The new token is kept for the next request
+    client.get('search')
+    assert spotify.tokens_issued == 2
+
+
+def test_ingestion_resumes_from_the_checkpoint(spotify, tmp_path):
+    checkpoint = IngestCheckpoint(str(tmp_path / 'checkpoint.jsonl'))
+    populate_tracks(['First Album'], client=spotify.client(), max_workers=2, checkpoint=checkpoint)
+    # An interrupted run can leave half a line behind
+    with open(checkpoint.path, 'a', encoding='utf-8') as checkpoint_file:
+        checkpoint_file.write('{"album": "Second Al')
+    spotify.requests.clear()
+
+    tracks = populate_tracks(list(ALBUMS), client=spotify.client(), max_workers=2, checkpoint=checkpoint)
+
+    assert tracks['track_id'].tolist() == ALBUMS['First Album'] + ALBUMS['Second Album']
+    assert tracks['tempo'].tolist() == [120.0] * 5
+    searched = [request['query']['q'] for request in spotify.gets() if request['path'] == '/v1/search']
+    assert searched == ['Second Album']
+    assert set(checkpoint.load()) == set(ALBUMS)
+
+
+def test_cached_responses_are_not_fetched_again(spotify, tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses'))
+    first = populate_tracks(list(ALBUMS), client=spotify.client(cache), max_workers=2,
+                            checkpoint=IngestCheckpoint(str(tmp_path / 'first.jsonl')))
+    spotify.requests.clear()
+
+    # With the checkpoint lost, every call is answered from the cache
+    second = populate_tracks(list(ALBUMS), client=spotify.client(cache), max_workers=2,
+                             checkpoint=IngestCheckpoint(str(tmp_path / 'second.jsonl')))
+
+    assert second.equals(first)
+    assert spotify.requests == []
@@ -0,0 +1,82 @@
+"""
+tests/test_snapshot.py
+
+Tests for the catalog snapshot in utils/snapshot.py: a snapshot reads back as the dataframe
+pd.read_csv gives for its CSV, and its memory-mapped string columns behave like object columns.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from utils.snapshot import MappedStrings, write_snapshot, read_snapshot, snapshot_is_current
+
+CSV = '''track_id,title,artist,genre,tempo,lyrics
+id-1,Café del Mar,Energy 52,trance,132.5,
+id-2,"Comma, Song",Artist A,pop,,https://lyrics/2
+id-3,,Artist A,pop,120.0,
+id-4,Ünïcödé,Artist B,,98.25,https://lyrics/4
+id-5,Café del Mar,Artist B,trance,132.5,
+'''
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    path.write_text(CSV, encoding='utf-8')
+    return str(path)
+
+
+def _as_objects(df):
+    return df.apply(lambda column: column.astype(object) if not pd.api.types.is_numeric_dtype(column) else column)
+
+
+def test_snapshot_reads_back_as_the_csv(csv_path, tmp_path):
+    expected = pd.read_csv(csv_path)
+    write_snapshot(expected, str(tmp_path / 'snapshot'), csv_path)
+
+    snapshot = read_snapshot(str(tmp_path / 'snapshot'))
+
+    assert isinstance(snapshot['track_id'].array, MappedStrings)
+    pd.testing.assert_frame_equal(_as_objects(snapshot), _as_objects(expected))
+
+
+def test_empty_strings_stay_distinct_from_missing_values(tmp_path):
+    expected = pd.DataFrame({'track_id': ['a', 'b', 'c', 'd'], 'note': ['', np.nan, 'x', ''],
+                             'unique_note': ['', np.nan, 'x', 'y']})
+    write_snapshot(expected, str(tmp_path / 'snapshot'))
+
+    snapshot = read_snapshot(str(tmp_path / 'snapshot'))
+
+    pd.testing.assert_frame_equal(_as_objects(snapshot), _as_objects(expected))
+
+
+@pytest.mark.parametrize('operation', [
+    lambda column: column.str.lower(),
+    lambda column: column.str.contains('a', case=False, na=False),
+    lambda column: column.str.len(),
+    lambda column: column.value_counts(),
+    lambda column: column.value_counts(dropna=False),
+    lambda column: column.iloc[2:].value_counts(),
+    lambda column: column == 'Abc',
+    lambda column: column.isna(),
+])
+def test_mapped_strings_behave_like_an_object_column(operation):
+    values = ['Abc', np.nan, '', 'de', 'Abc', 'xyz']
+    mapped = pd.Series(MappedStrings._from_sequence(values))
+    plain = pd.Series(values, dtype=object)
+
+    pd.testing.assert_series_equal(operation(mapped), operation(plain), check_dtype=False)
+
+
+def test_snapshot_goes_stale_when_the_csv_changes(csv_path, tmp_path):
+    directory = str(tmp_path / 'snapshot')
+    write_snapshot(pd.read_csv(csv_path), directory, csv_path)
+    assert snapshot_is_current(directory, csv_path)
+
+    with open(csv_path, 'a', encoding='utf-8') as csv_file:
+        csv_file.write('id-6,New Song,Artist C,pop,100.0,\n')
+
+    assert not snapshot_is_current(directory, csv_path)
+    os.remove(csv_path)
+    assert not snapshot_is_current(directory, csv_path)
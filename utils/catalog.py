@@ -0,0 +1,191 @@
+"""
+utils/catalog.py
+
+Loads the pre-processed track catalog once per process and shares it across the
+callback modules, along with the lookups built on top of it. The catalog is memory-mapped
+from its binary snapshot when one matches the CSV, and parsed from the CSV otherwise.
+
+Importing this module is cheap: pandas, the catalog and its index are only loaded on first
+use, or ahead of time by preload(), so a server can start accepting requests first.
+
+Defines:
+    - load_catalog(): Reads the catalog from its snapshot or CSV.
+    - preload(background): Loads the catalog and its index now, optionally in a background thread.
+    - sample_database: The catalog dataframe (loaded on first access).
+    - search_index: The SearchIndex built over the catalog (loaded on first access).
+    - facet_index: The FacetIndex of the catalog's tempos and genres (loaded on first access).
+    - get_track(track_id): Returns one track's data as a dict, or None if unknown.
+    - get_tracks(track_ids): Returns the data of several tracks in one batched lookup.
+    - album_track_ids(track_id): Returns the ids of every track on a track's album, in catalog order.
+    - search_track_ids(keyword, genres, tempo_range): Returns the match count and the best-scoring
+      track ids for a query, optionally filtered to some genres and a BPM range, along with its genre
+      and tempo facet counts. Results come from a bounded LRU cache of recent searches, and queries
+      narrow down from the matches of their cached prefixes. Queries with few exact matches are
+      topped up with fuzzy matches.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from utils.facets import FacetIndex, TEMPO_MIN, TEMPO_MAX
+from utils.search_index import SearchIndex, normalize_text, FUZZY_FALLBACK_HITS
+
+# NOTENOTES_CATALOG points the app at another catalog CSV, e.g. a synthetic one for benchmarks
+CATALOG_PATH = os.getenv('NOTENOTES_CATALOG', 'data/sample_database.csv')
+SNAPSHOT_PATH = os.path.splitext(CATALOG_PATH)[0] + '.snapshot'
+SEARCH_RESULT_CAP = 1000  # Most matches a single query keeps for paging
+QUERY_CACHE_SIZE = 256  # Recent queries whose results are kept
+NARROWING_MAX_MATCHES = 5000  # Largest match set kept for narrowing; broader ones go back to the postings
+
+
+def load_catalog():
+    # pandas is only imported once the catalog is needed
+    import pandas as pd
+    from utils.snapshot import read_snapshot, snapshot_is_current
+    if snapshot_is_current(SNAPSHOT_PATH, CATALOG_PATH):
+        return read_snapshot(SNAPSHOT_PATH)
+    return pd.read_csv(CATALOG_PATH)
+
+
+# The catalog dataframe, its search index, a hash index from track_id to row position
+# (so lookups don't scan the catalog) and its facet index; None until first use
+_loaded = None
+_load_lock = threading.Lock()
+LAZY_ATTRIBUTES = ('sample_database', 'search_index', 'track_positions', 'facet_index')
+
+
+def _catalog():
+    global _loaded
+    if _loaded is None:
+        with _load_lock:  # Requests arriving while it loads wait for the one load
+            if _loaded is None:
+                sample_database = load_catalog()
+                _loaded = (sample_database, SearchIndex(sample_database),
+                           {track_id: position for position, track_id in enumerate(sample_database['track_id'])},
+                           FacetIndex(sample_database))
+    return _loaded
+
+
+def preload(background=False):
+    if background:
+        threading.Thread(target=_catalog, name='catalog-preload', daemon=True).start()
+    else:
+        _catalog()
+
+
+# sample_database, search_index, track_positions and facet_index load the catalog on first access
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        return _catalog()[LAZY_ATTRIBUTES.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_track(track_id):
+    sample_database, _, track_positions, _ = _catalog()
+    position = track_positions.get(track_id)
+    if position is None:
+        return None
+    return sample_database.iloc[[position]].to_dict('records')[0]
+
+
+# Unknown ids are skipped; the rest come back in the order requested
+def get_tracks(track_ids):
+    sample_database, _, track_positions, _ = _catalog()
+    positions = [track_positions[track_id] for track_id in track_ids if track_id in track_positions]
+    return sample_database.iloc[positions].to_dict('records')
+
+
+# Tracks sharing the track's album and artist, found from the album's postings
+# rather than a scan of the catalog
+def album_track_ids(track_id):
+    _, search_index, track_positions, _ = _catalog()
+    position = track_positions.get(track_id)
+    if position is None:
+        return ()
+    albums, artists = search_index.values['album'], search_index.values['artist']
+    album, artist = albums[position], artists[position]
+    if not album:
+        return (track_id,)
+    positions = sorted(album_position for album_position in search_index.field_matches(album, 'album')
+                       if albums[album_position] == album and artists[album_position] == artist)
+    return tuple(search_index.track_ids[album_position] for album_position in positions)
+
+
+# Recent searches -> (match count, ranked track ids, facet counts), least recent first, keyed by
+# query and filters, so paging re-reads a search's entry. Recent queries' text matches (before
+# the filters) are kept separately while small enough to narrow from: a query extending a cached
+# one by a few characters (the next keystrokes of a live search) only filters that query's matches.
+_query_cache = OrderedDict()
+_match_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+# Passes the positions through, keeping them in `kept` until there are too many to narrow from
+def _keeping(positions, kept):
+    for position in positions:
+        if len(kept) <= NARROWING_MAX_MATCHES:
+            kept.append(position)
+        yield position
+
+
+def search_track_ids(keyword, genres=(), tempo_range=None):
+    _, search_index, _, facet_index = _catalog()
+    query = normalize_text(keyword)
+    genres = tuple(sorted(genres or ()))
+    # A range covering the whole slider is no tempo filter, so rows without a tempo still match
+    low, high = tempo_range or (TEMPO_MIN, TEMPO_MAX)
+    tempo_range = None if low <= TEMPO_MIN and high >= TEMPO_MAX else (low, high)
+    key = (query, genres, tempo_range)
+    with _query_cache_lock:
+        cached = _query_cache.get(key)
+        if cached is not None:
+            _query_cache.move_to_end(key)
+            return cached
+        # Narrow from the longest cached prefix of this query (the query itself, under other filters)
+        narrowed_query = next((query[:end] for end in range(len(query), 0, -1) if query[:end] in _match_cache), None)
+        narrowed_from = _match_cache[narrowed_query] if narrowed_query is not None else None
+        if narrowed_query is not None:
+            _match_cache.move_to_end(narrowed_query)
+
+    if query:
+        # Exact matches stream from the postings straight into top_k(); they're only gathered
+        # while few enough to be cached for narrowing
+        if narrowed_query == query:
+            kept = matches = narrowed_from
+        elif narrowed_from is not None:
+            kept = matches = search_index.matching_positions(query, within=narrowed_from)
+        else:
+            kept = []
+            matches = _keeping(search_index.iter_matches(query), kept)
+        # Matches are filtered and their facets counted as top_k() streams them, so no
+        # whole-catalog set is built; fuzzy matches are counted after the exact ones
+        counts = facet_index.new_counts()
+        match_count, positions = search_index.top_k(
+            query, SEARCH_RESULT_CAP, matches=facet_index.filter_matches(matches, genres, tempo_range, counts))
+        if len(kept) < FUZZY_FALLBACK_HITS:
+            # Likely a typo; fuzzy matches follow the exact ones but are never used for narrowing
+            fuzzy = search_index.fuzzy_top_k(query, SEARCH_RESULT_CAP - len(kept), exclude=kept)
+            positions += facet_index.filter_matches(fuzzy, genres, tempo_range, counts)
+            match_count = len(positions)
+        facets = facet_index.counted_facets(counts)
+    elif genres or tempo_range:  # Filters alone browse the whole catalog, in catalog order
+        genre_bits = facet_index.genres_bitset(genres)
+        tempo_bits = facet_index.tempo_bitset(*tempo_range) if tempo_range else facet_index.all_rows
+        facets = facet_index.facet_counts(facet_index.all_rows, genre_bits, tempo_bits)
+        selected_positions = facet_index.positions(genre_bits & tempo_bits)
+        match_count, positions = len(selected_positions), selected_positions[:SEARCH_RESULT_CAP].tolist()
+    else:
+        facets = facet_index.catalog_counts
+        match_count, positions = len(facet_index), list(range(min(len(facet_index), SEARCH_RESULT_CAP)))
+    track_ids = tuple(search_index.track_ids[position] for position in positions)
+
+    with _query_cache_lock:
+        _query_cache[key] = (match_count, track_ids, facets)
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+        # Broad match sets are slower to filter than to rebuild from the postings
+        if query and len(kept) <= NARROWING_MAX_MATCHES:
+            _match_cache[query] = kept
+            if len(_match_cache) > QUERY_CACHE_SIZE:
+                _match_cache.popitem(last=False)
+    return match_count, track_ids, facets
@@ -0,0 +1,134 @@
+"""
+utils/facets.py
+
+Precomputed indexes for filtering the catalog by tempo and genre, and for counting how many
+of a query's matches fall into each genre and tempo band, without rescanning the catalog.
+
+A text query's matches are filtered and counted as they stream out of the search index, from
+compact per-row genre, tempo band and tempo arrays, so only the matches are ever visited.
+Browsing with filters alone (no text query) selects from the whole catalog instead, using
+bitsets: Python ints whose bit i is set when row position i is in the set, so intersecting
+two sets is one `&` and counting one is `int.bit_count()`, both over a few bytes per thousand rows.
+
+Defines:
+    - TEMPO_MIN, TEMPO_MAX: The bounds of the tempo filter, in BPM.
+    - TEMPO_BAND_WIDTH: Width of the tempo bands facet counts are reported for.
+    - FacetIndex: The tempo and genre indexes of a catalog.
+"""
+
+from array import array
+
+TEMPO_MIN = 40
+TEMPO_MAX = 220
+TEMPO_BAND_WIDTH = 20
+BAND_LOWS = range(TEMPO_MIN - TEMPO_BAND_WIDTH, TEMPO_MAX + TEMPO_BAND_WIDTH, TEMPO_BAND_WIDTH)
+
+
+class FacetIndex:
+    def __init__(self, df):
+        import numpy as np
+        self.size = len(df)
+        self.all_rows = (1 << self.size) - 1
+
+        # Row positions sorted by tempo, so a BPM range is one slice found by binary search.
+        # Rows without a tempo are left out and never match a tempo filter.
+        tempos = df['tempo'].to_numpy(dtype=np.float64, na_value=np.nan)
+        known = np.flatnonzero(~np.isnan(tempos))
+        order = known[np.argsort(tempos[known], kind='stable')]
+        self.tempo_order = order
+        self.sorted_tempos = tempos[order]
+
+        # One bitset per genre, and per tempo band for the tempo facet counts
+        genres = df['genre'].astype(object).where(df['genre'].notna(), None).to_numpy()
+        self.genres = sorted({genre for genre in genres if genre is not None})
+        self.genre_bits = {genre: self.bitset(np.flatnonzero(genres == genre)) for genre in self.genres}
+        self.band_bits = {}
+        for low in BAND_LOWS:
+            bits = self.tempo_bitset(low, low + TEMPO_BAND_WIDTH, include_high=False)
+            if bits:
+                self.band_bits[low] = bits
+        self.band_lows = list(self.band_bits)
+
+        # Per-row genre and band numbers (one past the last for none) and tempos, for streaming.
+        # array.array indexes to plain ints and floats, at a few bytes per row.
+        genre_numbers = {genre: number for number, genre in enumerate(self.genres)}
+        band_numbers = {low: number for number, low in enumerate(self.band_lows)}
+        self.genre_numbers = genre_numbers
+        self.genre_codes = array('i', [genre_numbers.get(genre, len(self.genres)) for genre in genres])
+        band_lows = np.full(self.size, -1)
+        band_lows[known] = (BAND_LOWS.start + (tempos[known] - BAND_LOWS.start) // TEMPO_BAND_WIDTH
+                            * TEMPO_BAND_WIDTH)
+        self.band_codes = array('i', [band_numbers.get(low, len(self.band_lows)) for low in band_lows.tolist()])
+        self.tempos = array('d', tempos.tolist())
+
+        self.catalog_counts = self.facet_counts(self.all_rows, self.all_rows, self.all_rows)
+
+    def __len__(self):
+        return self.size
+
+    def bitset(self, positions):
+        import numpy as np
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(positions, dtype=np.intp)] = True
+        return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+    # The set rows as a boolean array indexed by row position
+    def mask(self, bits):
+        import numpy as np
+        packed = np.frombuffer(bits.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, bitorder='little', count=self.size).astype(bool)
+
+    def positions(self, bits):
+        import numpy as np
+        return np.flatnonzero(self.mask(bits))
+
+    # Rows with low <= tempo <= high (or < high), from two binary searches of the sorted tempos
+    def tempo_bitset(self, low, high, include_high=True):
+        import numpy as np
+        start = np.searchsorted(self.sorted_tempos, low, side='left')
+        end = np.searchsorted(self.sorted_tempos, high, side='right' if include_high else 'left')
+        return self.bitset(self.tempo_order[start:end])
+
+    # Rows of any of the genres; no genres means no genre filter
+    def genres_bitset(self, genres):
+        if not genres:
+            return self.all_rows
+        bits = 0
+        for genre in genres:
+            bits |= self.genre_bits.get(genre, 0)
+        return bits
+
+    # Each facet is counted over the rows passing every other filter, so the counts show
+    # what choosing another genre or tempo band would return
+    def facet_counts(self, text_bits, genre_bits, tempo_bits):
+        genre_base = text_bits & tempo_bits
+        tempo_base = text_bits & genre_bits
+        return {
+            'genre': {genre: (genre_base & bits).bit_count() for genre, bits in self.genre_bits.items()},
+            'tempo': {low: (tempo_base & bits).bit_count() for low, bits in self.band_bits.items()},
+        }
+
+    # Running facet counts for filter_matches(): per genre number, then per band number
+    def new_counts(self):
+        return [0] * (len(self.genres) + 1), [0] * (len(self.band_lows) + 1)
+
+    # Yields the matching positions that pass the genre and tempo filters, adding every
+    # match to `counts` (from new_counts()) on the way, counted like facet_counts()
+    def filter_matches(self, positions, genres, tempo_range, counts):
+        genre_codes, band_codes, tempos = self.genre_codes, self.band_codes, self.tempos
+        genre_counts, band_counts = counts
+        allowed = {self.genre_numbers[genre] for genre in genres if genre in self.genre_numbers} if genres else None
+        low, high = tempo_range or (None, None)
+        for position in positions:
+            in_genre = allowed is None or genre_codes[position] in allowed
+            in_tempo = tempo_range is None or low <= tempos[position] <= high  # False for no tempo
+            if in_tempo:
+                genre_counts[genre_codes[position]] += 1
+            if in_genre:
+                band_counts[band_codes[position]] += 1
+                if in_tempo:
+                    yield position
+
+    def counted_facets(self, counts):
+        genre_counts, band_counts = counts
+        return {'genre': dict(zip(self.genres, genre_counts)), 'tempo': dict(zip(self.band_lows, band_counts))}
@@ -6,14 +6,21 @@ Contains helper functions for the Dash application. These functions are used acr
 Defines:
     - modal_attributes_generator(song_data): Generates modal attributes for a given song data.
     - modal_resources_generator(song_data, track_id): Generates modal resources for a given song data and track ID.
-    - song_row_generator(track_id, info, page, personal_library): Generates a song row component.
-    - search_rank(keyword, df): Ranks search results based on the keyword and dataframe.
+    - song_row_generator(track_id, info, page, personal_library): Generates a song row component, reusing cached rows.
+    - invalidate_song_rows(*track_ids): Drops the tracks' cached rows after their library state changes.
+    - build_song_row(track_id, info, page, in_library, resource_flags): Renders a song row without the cache.
+    - search_rank(keyword, df, index, scored, limit, fuzzy): Ranks search results based on the keyword with the dataframe's
+      prebuilt search index (utils.catalog.search_index for the catalog), falling back to fuzzy matches when there are few exact ones.
 """
 
 import re
+import threading
+from collections import OrderedDict
 from dash import html
 import dash_bootstrap_components as dbc
 from utils.icons import add_icon_unfilled, add_icon_filled, edit_icon, lyrics_icon, chords_icon, sheet_music_icon
+from utils.search_index import FUZZY_FALLBACK_HITS
+from utils.thumbnails import thumbnail_src
 
 def modal_attributes_generator(song_data):
     # List of attributes to exclude from button generation
@@ -25,18 +32,14 @@ def modal_attributes_generator(song_data):
             # Convert to float, round up, and append units
             value = f"{round(float(value))}bpm"
         return dbc.Button(
-            html.Span(f"{attribute.title()}: {value}", style={'fontSize': '16px'}),
-            style={
-                'background-color': '#95CDF6',
-                'border': 'none',
-                'color': 'black',
-                'width': '150px'}
+            html.Span(f"{attribute.title()}: {value}", className='button-label'),
+            className='attribute-button'
         )
 
     # Add Tag button
     add_tag_button = dbc.Button(
         "Add Tag", id="add-tag-button", n_clicks=0,
-        style={'background-color': '#E9F5FE', 'border': 'none', 'color': 'black', 'width': '150px'}
+        className='attribute-button add-tag-button'
     )
 
     # Generate buttons for attributes not in the excluded list
@@ -47,11 +50,7 @@ def modal_attributes_generator(song_data):
             attribute_buttons.append(button_generator(attribute, attribute_value))
     
     # Wrap the buttons in a Div for display
-    attributes = html.Div(attribute_buttons, style={
-        'display': 'flex',
-        'flex-wrap': 'wrap',
-        'gap': '10px',
-        'justify-content': 'flex-start'})
+    attributes = html.Div(attribute_buttons, className='attribute-list')
 
     return attributes
 
@@ -68,38 +67,29 @@ def modal_resources_generator(song_data, track_id):
         if link == '':
             button_text = f"Add: {resource_name}"
             button = dbc.Button(
-                html.Span(button_text, style={'fontSize': '14px'}),
+                html.Span(button_text, className='button-label-small'),
                 id={
                     "index": track_id,
                     "type": "edit-resource",
                     "resource": resource_name.lower().replace(" ", "_")
                 },
                 n_clicks=0,
-                style={'cursor': 'pointer',
-                       'background-color': '#f9be82',
-                        'border': 'none',
-                       'color': 'white',
-                       'width': '150px'},
-                className='info-icon'
+                className='info-icon resource-button resource-button-empty'
             )
         else:
             if link == '': # If no lyrics have been added yet, don't make lyrics clickable
                 button = dbc.Button(
-                    html.Span(resource_name, style={'fontSize': '16px'}),
+                    html.Span(resource_name, className='button-label'),
                     id={
                         "index": track_id,
                         "type": "edit-resource",
                         "resource": resource_name.lower().replace(" ", "_")
                     },
-                    style={'cursor': 'pointer',
-                        'background-color': '#f9be82',
-                        'color': 'blue',
-                        'width': '150px'},
-                    className='info-icon'
+                    className='info-icon resource-button resource-button-linked'
                 )
             else:
                 button = dbc.Button(
-                    html.Span(resource_name, style={'fontSize': '16px'}),
+                    html.Span(resource_name, className='button-label'),
                     href=link,
                     id={
                         "index": track_id,
@@ -107,12 +97,7 @@ def modal_resources_generator(song_data, track_id):
                         "resource": resource_name.lower().replace(" ", "_")
                     },
                     n_clicks=0,
-                    style={'cursor': 'pointer',
-                        'background-color': '#f9be82',
-                        'color': 'blue',
-                        'textDecoration': 'underline',
-                        'width': '150px'},
-                    className='info-icon'
+                    className='info-icon resource-button resource-button-linked'
                 )
         return button
 
@@ -124,89 +109,99 @@ def modal_resources_generator(song_data, track_id):
         "Sheet Music", sheet_music_link, track_id)
 
     resources = dbc.Row(
-        html.Div([lyrics, chords, sheet_music], style={
-            'display': 'flex',
-            'justify-content': 'space-between'}
-        ), key=track_id, className='edit-resource')
+        html.Div([lyrics, chords, sheet_music], className='spaced-row'),
+        key=track_id, className='edit-resource')
 
     return resources
 
 # Row generator
 
 
+ROW_CACHE_SIZE = 2048  # Rendered rows kept for reuse across searches and library refreshes
+RESOURCE_TYPES = ['lyrics', 'chords', 'sheet_music']
+_row_cache = OrderedDict()
+_row_cache_lock = threading.Lock()
+
+
+# A rendered row only depends on the track, the page it's on, whether it's in the
+# library and which resources it has, so identical rows are reused from an LRU cache
 def song_row_generator(track_id, info, page, personal_library=None):
+    library_entry = (personal_library or {}).get(track_id)
+    in_library = library_entry is not None
+    resource_flags = tuple(bool(in_library and library_entry.get(resource_name))
+                           for resource_name in RESOURCE_TYPES)
+    cache_key = (track_id, page, in_library, resource_flags)
+
+    with _row_cache_lock:
+        row_contents = _row_cache.get(cache_key)
+        if row_contents is not None:
+            _row_cache.move_to_end(cache_key)
+            return row_contents
+
+    row_contents = build_song_row(track_id, info, page, in_library, resource_flags)
+    with _row_cache_lock:
+        _row_cache[cache_key] = row_contents
+        if len(_row_cache) > ROW_CACHE_SIZE:
+            _row_cache.popitem(last=False)
+    return row_contents
+
+
+# Drop the tracks' cached rows once their library state changes
+def invalidate_song_rows(*track_ids):
+    track_ids = set(track_ids)
+    with _row_cache_lock:
+        for cache_key in [cache_key for cache_key in _row_cache if cache_key[0] in track_ids]:
+            del _row_cache[cache_key]
+
+
+def build_song_row(track_id, info, page, in_library, resource_flags):
     row_type = f"{page}-row"
 
+    # Shared styles are CSS classes (assets/style.css), so rows don't repeat style dicts
     image = dbc.Col(html.Img(
-        src=info['image'],
-        style={
-            'width': '50px',
-            'borderRadius': '10px',
-        }
-    ), width=1, style={
-        'display': 'flex',
-        'justify-content': 'center',  # Center horizontally
-        'align-items': 'center',  # Center vertically
-    })
+        src=thumbnail_src(info['image']),  # Local thumbnail when cached, the CDN otherwise
+        className='song-art'
+    ), width=1, className='centered')
 
     # Rows of tracks
     row = dbc.Col(html.Div([
-        html.Div(info['title'], style={
-            'fontSize': '18px',
-            'color': 'black',
-            'marginBottom': '5px'
-        }),
-        html.Div(info['artist'], style={
-            'fontSize': '16px',
-            'color': 'gray'
-        }),
-    ], id={'type': row_type, 'index': track_id}, n_clicks=0, style={'cursor': 'pointer', 'marginLeft': '10px'}), width=4)
-
-    # Accompanying checkmarks per row
-    if track_id in personal_library:
+        html.Div(info['title'], className='song-title'),
+        html.Div(info['artist'], className='song-artist'),
+    ], id={'type': row_type, 'index': track_id}, n_clicks=0, className='song-info'), width=4)
+
+    # Accompanying checkmarks per row; the id carries what a click should do,
+    # so toggling doesn't need the whole library sent to the server
+    if in_library:
         checkbox = dbc.Col(html.Div(
             add_icon_filled,
-            id={'type': 'song-check', 'index': track_id},
+            id={'type': 'song-check', 'index': track_id, 'action': 'remove'},
             n_clicks=0,
             className='resource-icon',
-        ), width=2, style={
-            'display': 'flex',
-            'justify-content': 'center',  # Center horizontally
-            'align-items': 'center',  # Center vertically
-        })
+        ), width=2, className='centered')
     else:
         checkbox = dbc.Col(html.Div(
             add_icon_unfilled,
-            id={'type': 'song-check', 'index': track_id},
+            id={'type': 'song-check', 'index': track_id, 'action': 'add'},
             n_clicks=0,
             className='resource-icon',
-        ), width=2, style={
-            'display': 'flex',
-            'justify-content': 'center',  # Center horizontally
-            'align-items': 'center',  # Center vertically
-        })
+        ), width=2, className='centered')
 
     row_contents = [image, row, checkbox]
 
     # Add edit icon if the song is in the library
-    if track_id in personal_library:
+    if in_library:
         edit = dbc.Col(html.Button(
             edit_icon,
             id={"type": "edit-icon", "index": track_id},
             n_clicks=0,
-            className='resource-icon',
-            style={'border': 'none', 'background': 'none', 'cursor': 'pointer', 'margin': '0'}
-        ), style = {
-            'display': 'flex',
-            'justify-content': 'center',  # Center horizontally
-            'align-items': 'center',  # Center vertically
-        })
+            className='resource-icon icon-button'
+        ), className='centered')
         row_contents.append(edit)
 
     # Add icons for resources
     extra_resources = []
-    for resource_name in ['lyrics', 'chords', 'sheet_music']:
-        if track_id in personal_library and personal_library[track_id][resource_name]!='':
+    for resource_name, has_resource in zip(RESOURCE_TYPES, resource_flags):
+        if has_resource:
             resource = dbc.Col(html.Button(
                 globals()[f"{resource_name}_icon"],
                 id={
@@ -215,53 +210,36 @@ def song_row_generator(track_id, info, page, personal_library=None):
                     "resource": resource_name
                 },
                 n_clicks=0,
-                className='info-icon',
-                style={'border': 'none', 'background': 'none', 'cursor': 'pointer', 'margin': '0'}
+                className='info-icon icon-button'
             ))
             extra_resources.append(resource)
         else:
             pass
     if extra_resources:
         extra_resources = dbc.Col(
-            html.Div(extra_resources, style={
-                'display': 'flex',
-                'justify-content': 'space-between',
-            }), className='info-icon',
-                style={
-                    'display': 'flex',
-                    'justify-content': 'center',  # Center horizontally
-                    'align-items': 'center',  # Center vertically
-            })
+            html.Div(extra_resources, className='spaced-row'),
+            className='info-icon centered')
         row_contents.append(extra_resources)
 
     return row_contents
 
-# Return tracks by a specified priority
-
-
-def search_rank(keyword, df):
-    search_results = []
-    keyword = keyword.lower()
+# Return tracks by a specified priority. `index` is the SearchIndex the caller keeps for `df`,
+# since building one takes far longer than a search
 
-    # Search for matching titles
-    title_matches = df[df['title'].str.lower().str.contains(keyword)]
-    search_results.extend(title_matches['track_id'].tolist())
 
-    # Search for matching albums
-    album_matches = df[df['album'].str.lower().str.contains(keyword)]
-    for track_id in album_matches['track_id']:
-        if track_id not in search_results:
-            search_results.append(track_id)
-
-    # Search for matching artists
-    artist_matches = df[df['artist'].str.lower().str.contains(keyword)]
-    for track_id in artist_matches['track_id']:
-        if track_id not in search_results:
-            search_results.append(track_id)
-
-    # Create a list of search results in the format "Title – Artist"
-    search_results = df[df['track_id'].isin(search_results)]
-    return search_results.to_dict('records')
+def search_rank(keyword, df, index, scored=False, limit=None, fuzzy=True):
+    if scored:
+        # Best `limit` matches by relevance score
+        _, search_results = index.top_k(keyword, limit or len(index))
+    else:
+        # Row positions ranked title matches first, then album, then artist
+        search_results = index.search(keyword)[:limit]
+
+    # Few exact hits usually means a typo: add the closest fuzzy matches after them
+    if fuzzy and len(search_results) < FUZZY_FALLBACK_HITS:
+        remaining = (limit or len(index)) - len(search_results)
+        search_results = list(search_results) + index.fuzzy_top_k(keyword, remaining, exclude=search_results)
+    return df.iloc[search_results].to_dict('records')
 
 # Fill in a recommended link
 def resource_link_suggestion(resource_type=None, title=None, artist=None):
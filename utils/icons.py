@@ -2,16 +2,36 @@
 icons.py
 
 Centralizes shared icon definitions for the Dash application. These icons are imported and used across various modules to ensure consistency.
+The icons are cells of one sprite image (assets/icon_sprite.png and assets/icon_sprite.css, built by
+scripts/build_assets.py), so a page of rows loads a single image however many icons it shows.
 
 Defines:
-    - edit_icon: HTML image component for the edit icon.
+    - SPRITE_ICONS: The source image of each sprite cell, by icon name.
+    - sprite_icon(name): Returns an icon component showing one cell of the sprite.
+    - add_icon_unfilled, add_icon_filled, edit_icon, lyrics_icon, chords_icon, sheet_music_icon: The row icons.
 """
 
 from dash import html
 icon_size = '30px'
-add_icon_unfilled = html.Img(src="/assets/add_icon_unfilled.png", style={'width': icon_size})
-add_icon_filled = html.Img(src="/assets/add_icon_filled.png", style={'width': icon_size})
-edit_icon = html.Img(src="/assets/edit_icon.png", style={'width': icon_size})
-lyrics_icon = html.Img(src="/assets/lyrics_icon.png", style={'width': icon_size})
-chords_icon = html.Img(src="/assets/chords_icon.png", style={'width': icon_size})
-sheet_music_icon = html.Img(src="/assets/sheet_music_icon.png", style={'width': icon_size})
\ No newline at end of file
+
+# Sprite cells, left to right
+SPRITE_ICONS = {
+    'add-unfilled': 'add_icon_unfilled.png',
+    'add-filled': 'add_icon_filled.png',
+    'edit': 'edit_icon.png',
+    'lyrics': 'lyrics_icon.png',
+    'chords': 'chords_icon.png',
+    'sheet-music': 'sheet_music_icon.png',
+}
+
+
+def sprite_icon(name):
+    return html.Span(className=f'sprite-icon sprite-icon-{name}')
+
+
+add_icon_unfilled = sprite_icon('add-unfilled')
+add_icon_filled = sprite_icon('add-filled')
+edit_icon = sprite_icon('edit')
+lyrics_icon = sprite_icon('lyrics')
+chords_icon = sprite_icon('chords')
+sheet_music_icon = sprite_icon('sheet-music')
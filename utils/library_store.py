@@ -0,0 +1,268 @@
+"""
+utils/library_store.py
+
+Server-side storage for personal libraries, backed by SQLite. Each user's library is a set
+of rows keyed by (user_id, track_id), so every library operation reads or writes single rows
+and the browser only has to hold its user key.
+
+Rows keep their place in the library in an indexed `position` column, so finding where a
+track is doesn't number the whole library. Every write bumps the library's revision in
+`library_revisions`, which also holds its size, and returns a change describing it (see
+LibraryStore._change()), which pages showing the library can check their rendering against.
+
+Defines:
+    - LIBRARY_FIELDS: Fields stored for each library entry.
+    - RESOURCE_FIELDS: Fields holding the user's resource links.
+    - LibraryStore: Pooled SQLite access to per-user library entries.
+    - library_store: The LibraryStore shared by the callbacks.
+"""
+
+import os
+import queue
+import sqlite3
+from contextlib import closing, contextmanager
+
+LIBRARY_DB_PATH = os.getenv('NOTENOTES_LIBRARY_DB', 'data/library.db')
+CONNECTION_POOL_SIZE = 8
+EXPORT_BATCH_ROWS = 500  # Rows fetched at a time when streaming a library out
+
+LIBRARY_FIELDS = ['image', 'title', 'artist', 'album', 'tempo', 'genre', 'lyrics', 'chords', 'sheet_music']
+RESOURCE_FIELDS = ['lyrics', 'chords', 'sheet_music']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS library (
+    user_id TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    image TEXT,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    tempo REAL,
+    genre TEXT,
+    lyrics TEXT NOT NULL DEFAULT '',
+    chords TEXT NOT NULL DEFAULT '',
+    sheet_music TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, track_id)
+)
+"""
+REVISIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library_revisions (
+    user_id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    size INTEGER NOT NULL
+)
+"""
+POSITION_INDEX = 'CREATE INDEX IF NOT EXISTS library_position ON library (user_id, position)'
+ENTRY_COLUMNS = ', '.join(['track_id'] + LIBRARY_FIELDS)
+INSERT_COLUMNS = ', '.join(['user_id', 'track_id', 'position'] + LIBRARY_FIELDS)
+INSERT_PLACEHOLDERS = ', '.join('?' * (len(LIBRARY_FIELDS) + 3))
+
+
+class LibraryStore:
+    def __init__(self, path=LIBRARY_DB_PATH, pool_size=CONNECTION_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_pid = os.getpid()
+        # The store is created at import, which under gunicorn's preload_app is in the master,
+        # so the schema is made on a connection of its own and nothing is pooled before the fork
+        with closing(self._connect()) as connection, connection:
+            connection.execute(SCHEMA)
+            connection.execute(REVISIONS_SCHEMA)
+            self._add_positions(connection)
+            connection.execute(POSITION_INDEX)
+
+    # Libraries stored before rows had positions are numbered in the order they were added
+    @staticmethod
+    def _add_positions(connection):
+        columns = [row['name'] for row in connection.execute('PRAGMA table_info(library)')]
+        if 'position' in columns:
+            return
+        connection.execute('ALTER TABLE library ADD COLUMN position INTEGER NOT NULL DEFAULT 0')
+        connection.execute(
+            'UPDATE library SET position = numbered.position FROM ('
+            '    SELECT rowid AS id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY rowid) - 1 AS position'
+            '    FROM library'
+            ') AS numbered WHERE library.rowid = numbered.id')
+        connection.execute('INSERT OR REPLACE INTO library_revisions (user_id, revision, size) '
+                           'SELECT user_id, 1, COUNT(*) FROM library GROUP BY user_id')
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        # WAL lets readers carry on while another worker writes
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    # Borrow a pooled connection for one transaction
+    @contextmanager
+    def connection(self):
+        # SQLite connections can't cross a fork, so a forked worker starts its own pool
+        if self._pool_pid != os.getpid():
+            self._pool = queue.LifoQueue(maxsize=self.pool_size)
+            self._pool_pid = os.getpid()
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            with connection:  # Commits, or rolls back on error
+                yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    @staticmethod
+    def _entry(row):
+        return {field: row[field] for field in LIBRARY_FIELDS}
+
+    # The whole library as {track_id: entry}, in the order tracks were added
+    def get_library(self, user_id):
+        return self.get_library_with_revision(user_id)[1]
+
+    # The library with the revision it's at, read together, as (revision, {track_id: entry})
+    def get_library_with_revision(self, user_id):
+        with self.connection() as connection:
+            connection.execute('BEGIN')  # One read transaction for both queries
+            revision = connection.execute('SELECT revision FROM library_revisions WHERE user_id = ?',
+                                          (user_id,)).fetchone()
+            rows = connection.execute(
+                f'SELECT {ENTRY_COLUMNS} FROM library WHERE user_id = ? ORDER BY position', (user_id,))
+            return (revision['revision'] if revision else 0), {row['track_id']: self._entry(row) for row in rows}
+
+    # The library as (track_id, entry) pairs in the order tracks were added, fetched a batch
+    # at a time so exporting a large library never holds all of it
+    def iter_library(self, user_id, batch_size=EXPORT_BATCH_ROWS):
+        with self.connection() as connection:
+            cursor = connection.execute(
+                f'SELECT {ENTRY_COLUMNS} FROM library WHERE user_id = ? ORDER BY position', (user_id,))
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                for row in rows:
+                    yield row['track_id'], self._entry(row)
+                rows = cursor.fetchmany(batch_size)
+
+    def get_entry(self, user_id, track_id):
+        with self.connection() as connection:
+            row = connection.execute(
+                f'SELECT {ENTRY_COLUMNS} FROM library WHERE user_id = ? AND track_id = ?',
+                (user_id, track_id)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    # Entries for just the given tracks; tracks not in the library are left out
+    def get_entries(self, user_id, track_ids):
+        track_ids = list(track_ids)
+        if not track_ids:
+            return {}
+        placeholders = ', '.join('?' * len(track_ids))
+        with self.connection() as connection:
+            rows = connection.execute(
+                f'SELECT {ENTRY_COLUMNS} FROM library WHERE user_id = ? AND track_id IN ({placeholders})',
+                [user_id] + track_ids)
+            return {row['track_id']: self._entry(row) for row in rows}
+
+    # Starts a write by bumping the library's revision, which holds SQLite's write lock until
+    # the transaction ends, and returns the revision from before it and the library's size
+    @staticmethod
+    def _begin_write(connection, user_id):
+        row = connection.execute(
+            'INSERT INTO library_revisions (user_id, revision, size) VALUES (?, 1, 0) '
+            'ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1 RETURNING revision, size',
+            (user_id,)).fetchall()[0]
+        return row['revision'] - 1, row['size']
+
+    # Ends a write by recording the library's new size, and describes the change: the revisions
+    # from before and after it, the size, and the positions from before it of the tracks
+    # written that were already in the library
+    @staticmethod
+    def _change(connection, user_id, previous_revision, size, positions):
+        connection.execute('UPDATE library_revisions SET size = ? WHERE user_id = ?', (size, user_id))
+        return {'previous_revision': previous_revision, 'revision': previous_revision + 1, 'size': size,
+                'positions': positions}
+
+    # Where the given tracks are in the library, as {track_id: position}; tracks not in it are left out
+    @staticmethod
+    def _positions(connection, user_id, track_ids):
+        track_ids = list(track_ids)
+        if not track_ids:
+            return {}
+        placeholders = ', '.join('?' * len(track_ids))
+        rows = connection.execute(
+            f'SELECT track_id, position FROM library WHERE user_id = ? AND track_id IN ({placeholders})',
+            [user_id] + track_ids)
+        return {row['track_id']: row['position'] for row in rows}
+
+    # Inserts the tracks not in the library yet after its last row, and returns its new size
+    # and where the tracks already in it are
+    def _insert_tracks(self, connection, user_id, tracks, size, statement):
+        existing = self._positions(connection, user_id, [track['track_id'] for track in tracks])
+        added = {}
+        values = []
+        for track in tracks:
+            track_id = track['track_id']
+            if track_id not in existing and track_id not in added:
+                added[track_id] = size + len(added)
+            values.append([user_id, track_id, existing.get(track_id, added.get(track_id))]
+                          + [track.get(field, '') for field in LIBRARY_FIELDS])
+        connection.executemany(statement, values)
+        return size + len(added), existing
+
+    # Add catalog tracks to the library; tracks already in it keep their links
+    def add_tracks(self, user_id, tracks):
+        with self.connection() as connection:
+            previous_revision, size = self._begin_write(connection, user_id)
+            size, positions = self._insert_tracks(
+                connection, user_id, tracks, size,
+                f'INSERT OR IGNORE INTO library ({INSERT_COLUMNS}) VALUES ({INSERT_PLACEHOLDERS})')
+            return self._change(connection, user_id, previous_revision, size, positions)
+
+    # Merge imported tracks: new ones are added, and tracks already in the library take
+    # the imported resource links, keeping their own where the import has none
+    def import_tracks(self, user_id, tracks):
+        merged_links = ', '.join(f"{field} = CASE WHEN excluded.{field} != '' THEN excluded.{field} ELSE {field} END"
+                                 for field in RESOURCE_FIELDS)
+        with self.connection() as connection:
+            previous_revision, size = self._begin_write(connection, user_id)
+            size, positions = self._insert_tracks(
+                connection, user_id, tracks, size,
+                f'INSERT INTO library ({INSERT_COLUMNS}) VALUES ({INSERT_PLACEHOLDERS}) '
+                f'ON CONFLICT (user_id, track_id) DO UPDATE SET {merged_links}')
+            return self._change(connection, user_id, previous_revision, size, positions)
+
+    def add_track(self, user_id, track):
+        return self.add_tracks(user_id, [track])
+
+    # Removing tracks moves the rows after the first of them up, so positions stay contiguous
+    def remove_tracks(self, user_id, track_ids):
+        with self.connection() as connection:
+            previous_revision, size = self._begin_write(connection, user_id)
+            positions = self._positions(connection, user_id, track_ids)
+            if positions:
+                connection.executemany('DELETE FROM library WHERE user_id = ? AND track_id = ?',
+                                       [(user_id, track_id) for track_id in positions])
+                first = min(positions.values())
+                connection.execute(
+                    'UPDATE library SET position = numbered.position FROM ('
+                    '    SELECT rowid AS id, ? + ROW_NUMBER() OVER (ORDER BY position) - 1 AS position'
+                    '    FROM library WHERE user_id = ? AND position > ?'
+                    ') AS numbered WHERE library.rowid = numbered.id', (first, user_id, first))
+            return self._change(connection, user_id, previous_revision, size - len(positions), positions)
+
+    def remove_track(self, user_id, track_id):
+        return self.remove_tracks(user_id, [track_id])
+
+    def set_resource(self, user_id, track_id, resource_type, link):
+        if resource_type not in RESOURCE_FIELDS:
+            raise ValueError(f"Unknown resource type: {resource_type}")
+        with self.connection() as connection:
+            previous_revision, size = self._begin_write(connection, user_id)
+            positions = self._positions(connection, user_id, [track_id])
+            connection.execute(f'UPDATE library SET {resource_type} = ? WHERE user_id = ? AND track_id = ?',
+                               (link or '', user_id, track_id))
+            return self._change(connection, user_id, previous_revision, size, positions)
+
+library_store = LibraryStore()
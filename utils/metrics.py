@@ -0,0 +1,211 @@
+"""
+utils/metrics.py
+
+Per-callback metrics for the Dash server, exposed on /metrics in the Prometheus text format.
+Every server-side callback is wrapped once it is registered, to count its calls and time them;
+a Flask hook on the callback endpoint adds the request and response sizes. Recording is a
+dictionary lookup, a bisect and a few additions under a lock, so it can stay on permanently.
+
+Each callback's numbers are one row of doubles per process. When NOTENOTES_METRICS_DIR is set
+(gunicorn.conf.py sets it for its workers), rows are memory-mapped files in that directory, named
+by process and callback, and /metrics sums every process's files, so a scrape reports the whole
+server whichever worker answers it. Files of exited workers are kept, so counts never go down.
+
+Defines:
+    - Histogram: Cumulative-bucket histogram in the Prometheus style.
+    - CallbackMetrics: Call counts, latency and payload-size histograms per callback.
+    - callback_metrics: The CallbackMetrics shared by the app.
+    - instrument_callbacks(app): Wraps the app's registered callbacks and adds the /metrics route.
+"""
+
+import bisect
+import mmap
+import os
+import threading
+import time
+from array import array
+from functools import wraps
+from itertools import accumulate
+import flask
+from dash.exceptions import PreventUpdate
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]  # Seconds
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304]  # Bytes
+OUTCOMES = ['ok', 'prevented', 'error']
+CALLBACK_ENDPOINT = '/_dash-update-component'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_FILE_SUFFIX = '.metrics'
+
+
+# Counts print as integers, even though they're stored as doubles
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+# Counts per bucket (the last one is +Inf), then the sum and the count, stored in `values`
+# from `offset` on, so histograms can live in a shared row
+class Histogram:
+    def __init__(self, buckets, values=None, offset=0):
+        self.buckets = buckets
+        self.values = values if values is not None else array('d', [0]) * self.width(buckets)
+        self.offset = offset
+
+    @staticmethod
+    def width(buckets):
+        return len(buckets) + 3
+
+    def observe(self, value):
+        values, offset, size = self.values, self.offset, len(self.buckets)
+        values[offset + bisect.bisect_left(self.buckets, value)] += 1
+        values[offset + size + 1] += value
+        values[offset + size + 2] += 1
+
+    # Exposition lines; Prometheus buckets are cumulative
+    def lines(self, name, labels):
+        values, offset, size = self.values, self.offset, len(self.buckets)
+        cumulative = 0
+        for position, bound in enumerate(self.buckets + ['+Inf']):
+            cumulative += values[offset + position]
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {_number(cumulative)}'
+        yield f'{name}_sum{{{labels}}} {_number(values[offset + size + 1])}'
+        yield f'{name}_count{{{labels}}} {_number(values[offset + size + 2])}'
+
+
+# One row per callback: a call count per outcome, then the latency, request size and
+# response size histograms
+HISTOGRAMS = [
+    ('notenotes_callback_duration_seconds', 'Time spent running each Dash callback.', LATENCY_BUCKETS),
+    ('notenotes_callback_request_bytes', 'Size of Dash callback request bodies.', SIZE_BUCKETS),
+    ('notenotes_callback_response_bytes', 'Size of Dash callback response bodies.', SIZE_BUCKETS),
+]
+# Where each histogram starts in a row, and the row's width
+*HISTOGRAM_OFFSETS, ROW_WIDTH = accumulate([len(OUTCOMES)] + [Histogram.width(buckets) for _, _, buckets in HISTOGRAMS])
+
+
+class CallbackMetrics:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._rows = {}  # callback -> this process's row
+        self._pid = os.getpid()
+
+    def _row(self, callback):
+        # A forked worker records to rows of its own
+        if self._pid != os.getpid():
+            self._rows = {}
+            self._pid = os.getpid()
+        row = self._rows.get(callback)
+        if row is None:
+            if self.directory is None:
+                row = array('d', [0]) * ROW_WIDTH
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f'{self._pid}.{callback}{METRICS_FILE_SUFFIX}')
+                with open(path, 'w+b') as row_file:
+                    row_file.truncate(ROW_WIDTH * 8)
+                    row = memoryview(mmap.mmap(row_file.fileno(), ROW_WIDTH * 8)).cast('d')
+            self._rows[callback] = row
+        return row
+
+    def record_call(self, callback, outcome, seconds):
+        with self._lock:
+            row = self._row(callback)
+            row[OUTCOMES.index(outcome)] += 1
+            Histogram(LATENCY_BUCKETS, row, HISTOGRAM_OFFSETS[0]).observe(seconds)
+
+    def record_sizes(self, callback, request_size, response_size):
+        with self._lock:
+            row = self._row(callback)
+            Histogram(SIZE_BUCKETS, row, HISTOGRAM_OFFSETS[1]).observe(request_size)
+            Histogram(SIZE_BUCKETS, row, HISTOGRAM_OFFSETS[2]).observe(response_size)
+
+    # Every process's rows summed per callback, or this process's own without a directory
+    def totals(self):
+        if self.directory is None:
+            with self._lock:
+                return {callback: array('d', row) for callback, row in self._rows.items()}
+        totals = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return totals
+        for name in names:
+            if not name.endswith(METRICS_FILE_SUFFIX):
+                continue
+            callback = name[:-len(METRICS_FILE_SUFFIX)].split('.', 1)[1]
+            row = array('d')
+            with open(os.path.join(self.directory, name), 'rb') as row_file:
+                row.frombytes(row_file.read(ROW_WIDTH * 8))
+            if len(row) != ROW_WIDTH:
+                continue  # Still being created
+            total = totals.setdefault(callback, array('d', [0]) * ROW_WIDTH)
+            for position, value in enumerate(row):
+                total[position] += value
+        return totals
+
+    def render(self):
+        totals = sorted(self.totals().items())
+        lines = [
+            '# HELP notenotes_callback_calls_total Dash callback invocations, by outcome.',
+            '# TYPE notenotes_callback_calls_total counter',
+        ]
+        for callback, row in totals:
+            for position, outcome in enumerate(OUTCOMES):
+                if row[position]:
+                    lines.append(f'notenotes_callback_calls_total{{callback="{callback}",outcome="{outcome}"}} '
+                                 f'{_number(row[position])}')
+        for (name, description, buckets), offset in zip(HISTOGRAMS, HISTOGRAM_OFFSETS):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for callback, row in totals:
+                histogram = Histogram(buckets, row, offset)
+                if row[offset + len(buckets) + 2]:
+                    lines.extend(histogram.lines(name, f'callback="{callback}"'))
+        return '\n'.join(lines) + '\n'
+
+
+callback_metrics = CallbackMetrics(os.getenv('NOTENOTES_METRICS_DIR'))
+
+
+def _instrument(callback_name, callback, metrics):
+    @wraps(callback)
+    def instrumented(*args, **kwargs):
+        flask.g.callback_name = callback_name  # For the byte sizes, recorded once the response is built
+        outcome = 'error'
+        start = time.perf_counter()
+        try:
+            result = callback(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        except PreventUpdate:
+            outcome = 'prevented'
+            raise
+        finally:
+            metrics.record_call(callback_name, outcome, time.perf_counter() - start)
+    instrumented.instrumented = True
+    return instrumented
+
+
+def instrument_callbacks(app, metrics=callback_metrics):
+    # Wrap what Dash's dispatcher calls, so the timing includes input validation and
+    # serializing the response; clientside callbacks never reach the server
+    for callback_spec in app.callback_map.values():
+        callback = callback_spec.get('callback')
+        if callback is not None and not getattr(callback, 'instrumented', False):
+            callback_spec['callback'] = _instrument(callback.__name__, callback, metrics)
+
+    server = app.server
+    if 'metrics' in server.view_functions:
+        return
+
+    @server.after_request
+    def record_callback_sizes(response):
+        callback_name = flask.g.get('callback_name')
+        if callback_name is not None and flask.request.path == CALLBACK_ENDPOINT:
+            metrics.record_sizes(callback_name, flask.request.content_length or 0,
+                                 response.calculate_content_length() or 0)
+        return response
+
+    @server.route('/metrics', endpoint='metrics')
+    def metrics_endpoint():
+        return flask.Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,225 @@
+"""
+utils/search_index.py
+
+Builds an in-memory n-gram index over the catalog so that searches are answered
+from postings instead of rescanning every row of the dataframe.
+
+Defines:
+    - SEARCH_FIELDS: Searchable columns, in ranking priority order.
+    - normalize_text(text): Case-folds and accent-folds a string for matching.
+    - ngrams(text, max_size): Returns every n-gram of `text` up to `max_size` characters.
+    - match_strength(query, value): Grades how well a query matches one field value.
+    - fuzzy_grams(text): Returns the word-padded trigrams used for typo-tolerant matching.
+    - SearchIndex: Per-field n-gram postings answering substring, top-k scored and fuzzy queries.
+"""
+
+import heapq
+import re
+import unicodedata
+
+SEARCH_FIELDS = ['title', 'album', 'artist']  # Title matches rank first, then album, then artist
+NGRAM_SIZE = 3
+
+# Relevance scoring: a field's weight times the strength of its best match
+FIELD_WEIGHTS = {'title': 3, 'album': 2, 'artist': 1}
+EXACT_VALUE = 4  # The whole value is the query
+EXACT_TOKEN = 3  # The query starts and ends on word boundaries
+PREFIX = 2  # The query starts on a word boundary
+INFIX = 1  # The query appears inside a word
+
+# Fuzzy matching: trigram Jaccard similarity between the query and a field value
+FUZZY_MIN_SIMILARITY = 0.3  # Weaker matches are dropped
+FUZZY_FALLBACK_HITS = 5  # Exact searches with fewer hits are topped up with fuzzy matches
+
+
+# Fold case and strip accents so "Beyoncé" matches "beyonce"
+def normalize_text(text):
+    if not isinstance(text, str):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def ngrams(text, max_size=NGRAM_SIZE):
+    grams = set()
+    for size in range(1, max_size + 1):
+        for start in range(len(text) - size + 1):
+            grams.add(text[start:start + size])
+    return grams
+
+
+def match_strength(query, value):
+    if value == query:
+        return EXACT_VALUE
+    best = 0
+    start = value.find(query)
+    while start != -1 and best < EXACT_TOKEN:
+        end = start + len(query)
+        at_word_start = start == 0 or not value[start - 1].isalnum()
+        at_word_end = end == len(value) or not value[end].isalnum()
+        if at_word_start and at_word_end:
+            best = EXACT_TOKEN
+        elif at_word_start:
+            best = max(best, PREFIX)
+        else:
+            best = max(best, INFIX)
+        start = value.find(query, start + 1)
+    return best
+
+
+# Trigrams of each word padded with spaces, so word starts and ends count as grams
+# and a typo only spoils the few grams around it
+def fuzzy_grams(text):
+    grams = set()
+    for word in re.findall(r'\w+', text):
+        padded = f' {word} '
+        grams.update(padded[start:start + NGRAM_SIZE] for start in range(len(padded) - NGRAM_SIZE + 1))
+    return grams
+
+
+class SearchIndex:
+    def __init__(self, df, fields=SEARCH_FIELDS):
+        import numpy as np  # Imported here so importing the module stays cheap
+        self.fields = list(fields)
+        self.track_ids = df['track_id'].tolist()
+        self.values = {}  # field -> normalized value per row position
+        self.postings = {}  # field -> n-gram -> set of row positions
+        self.fuzzy_postings = {}  # field -> padded trigram -> int32 array of row positions
+        self.fuzzy_sizes = {}  # field -> number of padded trigrams per row position
+
+        for field in self.fields:
+            values = [normalize_text(value) for value in df[field].tolist()]
+            postings = {}
+            fuzzy_postings = {}
+            fuzzy_sizes = np.zeros(len(values), dtype=np.int32)
+            # Distinct values (albums, artists) are split into grams only once
+            value_grams = {}
+            for position, value in enumerate(values):
+                for gram in ngrams(value):
+                    postings.setdefault(gram, set()).add(position)
+                grams = value_grams.get(value)
+                if grams is None:
+                    grams = value_grams[value] = fuzzy_grams(value)
+                fuzzy_sizes[position] = len(grams)
+                for gram in grams:
+                    fuzzy_postings.setdefault(gram, []).append(position)
+            self.values[field] = values
+            self.postings[field] = postings
+            self.fuzzy_postings[field] = {gram: np.array(positions, dtype=np.int32)
+                                          for gram, positions in fuzzy_postings.items()}
+            self.fuzzy_sizes[field] = fuzzy_sizes
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    # Row positions whose `field` contains the (already normalized) query.
+    # May return the index's own posting set, so callers must not mutate it.
+    def field_matches(self, query, field):
+        if not query:
+            return set(range(len(self)))
+        postings = self.postings[field]
+
+        # Queries no longer than an n-gram are answered by a single posting list
+        if len(query) <= NGRAM_SIZE:
+            return postings.get(query, set())
+
+        # Longer queries: intersect the postings of their n-grams, rarest first,
+        # then verify the surviving candidates against the full value
+        grams = {query[start:start + NGRAM_SIZE] for start in range(len(query) - NGRAM_SIZE + 1)}
+        gram_postings = sorted((postings.get(gram, set()) for gram in grams), key=len)
+        if not gram_postings[0]:
+            return set()
+        candidates = gram_postings[0].intersection(*gram_postings[1:])
+        values = self.values[field]
+        return {position for position in candidates if query in values[position]}
+
+    # Row positions matching the keyword in any field, ranked by field priority
+    # and by catalog order within each field
+    def search(self, keyword):
+        query = normalize_text(keyword)
+        ranked = []
+        seen = set()
+        for field in self.fields:
+            matches = self.field_matches(query, field) - seen
+            ranked.extend(sorted(matches))
+            seen.update(matches)
+        return ranked
+
+    def search_track_ids(self, keyword):
+        return [self.track_ids[position] for position in self.search(keyword)]
+
+    # `strengths` memoizes match strength per value, since albums and artists repeat across rows
+    def score(self, query, position, strengths=None):
+        if strengths is None:
+            strengths = {}
+        total = 0
+        for field in self.fields:
+            value = self.values[field][position]
+            strength = strengths.get(value)
+            if strength is None:
+                strength = strengths[value] = match_strength(query, value)
+            total += FIELD_WEIGHTS.get(field, 1) * strength
+        return total
+
+    # Each matching row position once, straight from the postings
+    def iter_matches(self, query):
+        for field_number, field in enumerate(self.fields):
+            earlier_fields = self.fields[:field_number]
+            for position in self.field_matches(query, field):
+                # Rows matching an earlier field were already yielded there
+                if not any(query in self.values[earlier][position] for earlier in earlier_fields):
+                    yield position
+
+    # Matching row positions, optionally narrowed from an earlier result set. Any row
+    # matching a query also matches every substring of it, so the matches of a query
+    # that extends an earlier one are found by filtering the earlier matches.
+    def matching_positions(self, keyword, within=None):
+        query = normalize_text(keyword)
+        if within is None:
+            return list(self.iter_matches(query))
+        return [position for position in within
+                if any(query in self.values[field][position] for field in self.fields)]
+
+    # The k best matches by relevance score (ties keep catalog order), kept in a
+    # bounded min-heap so the full match set is never sorted. Scores the given
+    # matching positions, or streams matches from the postings when none are given.
+    # Returns the total number of matches along with the ranked row positions.
+    def top_k(self, keyword, k, matches=None):
+        query = normalize_text(keyword)
+        heap = []
+        strengths = {}
+        match_count = 0
+        for position in (self.iter_matches(query) if matches is None else matches):
+            match_count += 1
+            entry = (self.score(query, position, strengths), -position)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        return match_count, [-position for _, position in sorted(heap, reverse=True)]
+
+    # The k rows most similar to the keyword by trigram Jaccard similarity, for queries
+    # with typos that match nothing exactly. Each query gram's posting array is counted
+    # with one bincount per field, so no row is compared on its own.
+    # Positions in `exclude` (usually the exact matches) are left out.
+    def fuzzy_top_k(self, keyword, k, exclude=()):
+        import numpy as np
+        query_grams = fuzzy_grams(normalize_text(keyword))
+        if not query_grams or k <= 0:
+            return []
+        similarity = np.zeros(len(self), dtype=np.float32)
+        for field in self.fields:
+            postings = self.fuzzy_postings[field]
+            gram_positions = [postings[gram] for gram in query_grams if gram in postings]
+            if not gram_positions:
+                continue
+            shared = np.bincount(np.concatenate(gram_positions), minlength=len(self))
+            union = len(query_grams) + self.fuzzy_sizes[field] - shared
+            np.maximum(similarity, shared / np.maximum(union, 1), out=similarity)
+
+        similarity[list(exclude)] = 0
+        candidates = np.flatnonzero(similarity >= FUZZY_MIN_SIMILARITY)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-similarity[candidates], k - 1)[:k]]
+        # Most similar first; ties keep catalog order
+        return candidates[np.lexsort((candidates, -similarity[candidates]))].tolist()
@@ -0,0 +1,225 @@
+"""
+utils/snapshot.py
+
+Binary columnar snapshot of the catalog, loaded by memory-mapping instead of parsing CSV text.
+The CSV stays the interchange format; the snapshot is a build artifact written next to it.
+
+A snapshot is a directory holding a manifest plus one set of .npy files per column:
+    - numeric columns: `<column>.npy`, a fixed-width array.
+    - text columns: dictionary-encoded as `<column>.codes.npy` (int32 row codes, -1 for missing),
+      with the distinct values stored as one NUL-separated UTF-8 blob `<column>.values.npy`
+      and the byte offset where each value starts in `<column>.offsets.npy`.
+
+Text columns with a value per row (ids, titles) are read back as MappedStrings, which decode
+values from the memory-mapped blob as they're accessed, so no process holds them as Python
+strings; columns with repeated values (albums, artists, genres) become categoricals.
+
+Defines:
+    - MappedStrings: A pandas extension array of strings decoded on access from a UTF-8 blob.
+    - write_snapshot(df, directory, source_path): Writes a snapshot of a dataframe.
+    - snapshot_is_current(directory, source_path): Checks a snapshot still matches its CSV.
+    - read_snapshot(directory): Memory-maps a snapshot back into a dataframe.
+
+Usage:
+    python -m utils.snapshot  # Rebuild the snapshot from data/sample_database.csv
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionArray, ExtensionDtype, register_extension_dtype, take
+from pandas.api.indexers import check_array_indexer
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+# Distinct values as one NUL-separated UTF-8 blob, and the offset where each value starts
+# (plus one past the end, so value i is blob[offsets[i]:offsets[i + 1] - 1])
+def _encode_values(values):
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) + 1 for value in encoded])
+    return np.frombuffer(b'\0'.join(encoded), dtype=np.uint8), offsets
+
+
+@register_extension_dtype
+class MappedStringDtype(ExtensionDtype):
+    name = 'mapped_string'
+    type = str
+    kind = 'O'
+    na_value = np.nan
+
+    @classmethod
+    def construct_array_type(cls):
+        return MappedStrings
+
+
+# Rows are codes into the blob's values (-1 for missing); slicing and take() only touch the
+# codes, and values are decoded one at a time, or in one pass when most of them are needed
+class MappedStrings(ExtensionArray):
+    def __init__(self, codes, blob, offsets):
+        self._codes = codes
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def _from_sequence(cls, scalars, *, dtype=None, copy=False):
+        codes, uniques = pd.factorize(np.asarray(scalars, dtype=object), use_na_sentinel=True)
+        return cls(codes.astype(np.int32), *_encode_values(uniques))
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls._from_sequence(values)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        return cls._from_sequence([value for array in to_concat for value in array.tolist()])
+
+    @property
+    def dtype(self):
+        return MappedStringDtype()
+
+    @property
+    def nbytes(self):
+        return self._codes.nbytes + self._blob.nbytes + self._offsets.nbytes
+
+    def __len__(self):
+        return len(self._codes)
+
+    def _value(self, code):
+        if code < 0:
+            return np.nan
+        return self._blob[self._offsets[code]:self._offsets[code + 1] - 1].tobytes().decode('utf-8')
+
+    def __getitem__(self, item):
+        if pd.api.types.is_integer(item):
+            return self._value(self._codes[item])
+        if not isinstance(item, slice):
+            item = check_array_indexer(self, item)
+        return type(self)(self._codes[item], self._blob, self._offsets)
+
+    def tolist(self):
+        codes = np.asarray(self._codes).tolist()
+        if len(codes) * 8 < len(self._offsets):
+            return [self._value(code) for code in codes]
+        values = self._blob.tobytes().decode('utf-8').split('\0') if len(self._blob) else []
+        return [values[code] if code >= 0 else np.nan for code in codes]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.tolist(), dtype=object if dtype is None else dtype)
+
+    def __eq__(self, other):
+        return np.asarray(self) == (np.asarray(other, dtype=object) if pd.api.types.is_list_like(other) else other)
+
+    def isna(self):
+        return np.asarray(self._codes) < 0
+
+    # Counted on the codes, so only the values present are decoded; values are listed in the
+    # order they first appear, which Series.value_counts() keeps for equal counts
+    def value_counts(self, dropna=True):
+        codes = np.asarray(self._codes)
+        if dropna:
+            codes = codes[codes >= 0]
+        present, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        values = [self._value(code) for code in present[order]]
+        return pd.Series(counts[order], index=pd.Index(values, dtype=object), name='count')
+
+    # Series.str methods run on the decoded values, as they would on an object column
+    def __getattr__(self, name):
+        if name.startswith('_str_'):
+            return getattr(pd.arrays.NumpyExtensionArray(np.asarray(self)), name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def take(self, indices, allow_fill=False, fill_value=None):
+        if allow_fill and not pd.isna(fill_value):
+            raise ValueError("MappedStrings can only be filled with missing values")
+        codes = take(np.asarray(self._codes), indices, allow_fill=allow_fill, fill_value=-1)
+        return type(self)(codes, self._blob, self._offsets)
+
+    def copy(self):
+        # The blob is read-only, so copies share it
+        return type(self)(np.array(self._codes), self._blob, self._offsets)
+
+
+# Size and modification time identify the CSV a snapshot was built from,
+# without having to read the CSV at startup
+def _source_stamp(source_path):
+    stat = os.stat(source_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def write_snapshot(df, directory, source_path=None):
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_numeric_dtype(column):
+            np.save(os.path.join(directory, f'{name}.npy'), column.to_numpy())
+            columns.append({'name': name, 'encoding': 'plain'})
+        else:
+            codes, uniques = pd.factorize(column, use_na_sentinel=True)
+            blob, offsets = _encode_values(uniques)
+            np.save(os.path.join(directory, f'{name}.codes.npy'), codes.astype(np.int32))
+            np.save(os.path.join(directory, f'{name}.values.npy'), blob)
+            np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+            columns.append({'name': name, 'encoding': 'dictionary'})
+
+    manifest = {'version': SNAPSHOT_VERSION, 'rows': len(df), 'columns': columns}
+    if source_path is not None:
+        manifest.update(_source_stamp(source_path))
+    # The manifest goes last, so a half-written snapshot is never picked up
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def snapshot_is_current(directory, source_path):
+    manifest = _read_manifest(directory)
+    if manifest is None or manifest.get('version') != SNAPSHOT_VERSION:
+        return False
+    try:
+        stamp = _source_stamp(source_path)
+    except FileNotFoundError:
+        return False  # Nothing to check it against
+    return all(manifest.get(key) == value for key, value in stamp.items())
+
+
+def read_snapshot(directory):
+    manifest = _read_manifest(directory)
+    data = {}
+    for column in manifest['columns']:
+        name = column['name']
+        if column['encoding'] == 'plain':
+            data[name] = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+        else:
+            codes = np.load(os.path.join(directory, f'{name}.codes.npy'), mmap_mode='r')
+            blob = np.load(os.path.join(directory, f'{name}.values.npy'), mmap_mode='r')
+            offsets = np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r')
+            if len(offsets) - 1 == manifest['rows']:
+                # Every row distinct (ids, titles): left in the mapped blob, shared by every process
+                data[name] = MappedStrings(codes, blob, offsets)
+            else:
+                # Repeated values (albums, artists, genres): only the distinct values are decoded,
+                # in one pass over the blob, and rows stay as codes into them
+                values = blob.tobytes().decode('utf-8').split('\0') if len(blob) else []
+                data[name] = pd.Categorical.from_codes(codes, categories=values)
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == '__main__':
+    # Paths match utils.catalog, which isn't imported here so the old snapshot isn't loaded
+    write_snapshot(pd.read_csv('data/sample_database.csv'), 'data/sample_database.snapshot',
+                   'data/sample_database.csv')
@@ -5,7 +5,9 @@ Centralizes shared style definitions for the Dash application. These styles are
 
 Defines:
     - main_header_style: Style for main headers.
-    - border_style, icon_style, nav_bar_style, menu_col_style, main_display_style, track_display_style: Other shared styles.
+    - border_style, icon_style, nav_bar_style, menu_col_style, main_display_style: Other shared styles.
+    Styles repeated on every track row and modal button are CSS classes in assets/style.css instead.
+    - search_button_style, pagination_style: Styles for the search bar button and the search result pager.
 """
 
 # border_style = '0px solid #ccc'
@@ -36,15 +38,17 @@ main_display_style = {
     'padding': '20px 20px 20px 20px',
     'overflow-y': 'auto',
 }
-track_display_style = {
-    'border': '1px solid #DAE9F4',
+modal_display_style = {
+    'background': 'linear-gradient(to top, #C0DDF3, #ffffff)',
+}
+search_button_style = {
+    'height': '38px',
     'borderRadius': '10px',
-    'margin': '0px',
-    'padding': '10px',
-    'cursor': 'pointer',
+    'borderColor': '#ccc',
+}
+pagination_style = {
     'display': 'flex',
-    'flexWrap': 'nowrap',
+    'justifyContent': 'space-between',
+    'alignItems': 'center',
+    'padding': '10px 0px 10px 0px',
 }
-modal_display_style = {
-    'background': 'linear-gradient(to top, #C0DDF3, #ffffff)',
-}
\ No newline at end of file
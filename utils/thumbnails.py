@@ -0,0 +1,37 @@
+"""
+utils/thumbnails.py
+
+Serves album art from the local thumbnail cache built by scripts/build_assets.py, so rows don't
+hotlink the image CDN. Thumbnails are named by a hash of their content, and a manifest maps
+each source image URL to its thumbnail. Images missing from the cache keep their source URL.
+
+Defines:
+    - THUMBNAIL_DIR: Directory of the thumbnail cache, inside the Dash assets folder.
+    - load_manifest(): Reads the source URL -> thumbnail file manifest.
+    - thumbnail_src(image_url): Returns the local thumbnail URL for an image, or the image URL itself.
+"""
+
+import json
+import os
+
+THUMBNAIL_DIR = 'assets/thumbnails'
+MANIFEST_PATH = os.path.join(THUMBNAIL_DIR, 'manifest.json')
+THUMBNAIL_URL_PREFIX = '/assets/thumbnails/'
+
+_manifest = None  # Read once per process, on first use
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def thumbnail_src(image_url):
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    thumbnail = _manifest.get(image_url)
+    return THUMBNAIL_URL_PREFIX + thumbnail if thumbnail else image_url
@@ -0,0 +1,26 @@
+"""
+wsgi.py
+
+Production entry point, for a pre-forking WSGI server (see gunicorn.conf.py). The catalog and
+its search index are loaded here, in the parent process, before the workers are forked, so
+every worker shares the same read-only pages copy-on-write instead of loading its own copy.
+
+Defines:
+    - server: The Flask server behind the Dash app, as a WSGI application.
+
+Usage:
+    gunicorn  # Reads gunicorn.conf.py from the project root
+"""
+
+import gc
+from main import app
+from utils import catalog
+
+catalog.preload()
+
+# Everything loaded so far lives as long as the process. Moving it out of the garbage
+# collector's generations means collections in the workers never write to those objects,
+# which would copy the pages they sit on into every worker.
+gc.freeze()
+
+server = app.server